@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException, Depends, Header
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
 import asyncio
 import json
+import math
 import os
 import time
 import uuid
+from collections import OrderedDict
 from urllib.request import Request, urlopen
 import jwt
 from pathlib import Path
+from metrics import Registry, RequestMetricsMiddleware
 
 TRACKING_URL = os.getenv("TRACKING_URL", "http://127.0.0.1:8002")
 JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY")
@@ -17,11 +21,28 @@ JWT_PUBLIC_KEY_PATH = os.getenv("JWT_PUBLIC_KEY_PATH")
 JWT_ISSUER = os.getenv("JWT_ISSUER", "droneapp")
 JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "droneapp-clients")
 ACCESS_TTL_SECONDS = int(os.getenv("ACCESS_TTL_SECONDS", "900"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+METERS_PER_DEG = 111195.0
+SEQ_EPOCH_STRIDE = 1000
 
 app = FastAPI(title="Drone Simulator")
 
 active_flights: dict[str, asyncio.Task] = {}
 
+metrics_registry = Registry()
+http_request_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+jwt_seconds = metrics_registry.histogram("jwt_duration_seconds", "JWT sign/verify latency", ("operation",))
+telemetry_send_seconds = metrics_registry.histogram(
+    "telemetry_send_duration_seconds", "Latency of POST /telemetry to the tracking service", ("result",)
+)
+flight_errors = metrics_registry.counter("simulator_flight_errors_total", "Flights aborted by an error")
+metrics_registry.gauge("simulator_active_flights", "Flights currently being simulated", lambda: len(active_flights))
+app.add_middleware(RequestMetricsMiddleware, histogram=http_request_seconds)
+_seen_idempotency_keys: OrderedDict[str, float] = OrderedDict()
+_last_seq_epoch = 0
+
 
 class StartRequest(BaseModel):
     delivery_id: str
@@ -31,12 +52,24 @@ class StartRequest(BaseModel):
     end_lng: float = 76.9170
     duration_sec: float = 10.0
     update_interval_sec: float = 3.0
+    idempotency_key: str | None = None
+    drone_id: str | None = None
+    waypoints: list[tuple[float, float]] | None = None
+    trace_id: str | None = None
 
 
 class CancelRequest(BaseModel):
     delivery_id: str
 
 
+class BatchStartRequest(BaseModel):
+    flights: list[dict]
+
+
+class BatchCancelRequest(BaseModel):
+    delivery_ids: list[str]
+
+
 def _read_key_value(value: str | None, path: str | None, env_name: str) -> str:
     if value:
         return value.replace("\\n", "\n")
@@ -69,17 +102,19 @@ def _issue_access_token(delivery_id: str, role: str, scopes: list[str]) -> str:
         "nbf": now,
         "exp": now + ACCESS_TTL_SECONDS,
     }
-    return jwt.encode(payload, _load_private_key(), algorithm="RS256")
+    with jwt_seconds.time("sign"):
+        return jwt.encode(payload, _load_private_key(), algorithm="RS256")
 
 
 def _decode_token(token: str) -> dict:
-    return jwt.decode(
-        token,
-        _load_public_key(),
-        algorithms=["RS256"],
-        audience=JWT_AUDIENCE,
-        issuer=JWT_ISSUER,
-    )
+    with jwt_seconds.time("verify"):
+        return jwt.decode(
+            token,
+            _load_public_key(),
+            algorithms=["RS256"],
+            audience=JWT_AUDIENCE,
+            issuer=JWT_ISSUER,
+        )
 
 
 def _extract_bearer(authorization: str | None) -> str | None:
@@ -116,8 +151,8 @@ def _build_status(progress: float, delivered: bool) -> str:
 
 async def _send_telemetry(payload: dict) -> None:
     def _post() -> None:
-        data = json.dumps(payload).encode("utf-8")
         token = _issue_access_token(payload["delivery_id"], "drone_device", ["telemetry:write"])
+        data = json.dumps({**payload, "emitted_at": time.time()}).encode("utf-8")
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
@@ -130,11 +165,52 @@ async def _send_telemetry(payload: dict) -> None:
         with urlopen(req, timeout=5) as resp:
             resp.read()
 
-    await asyncio.to_thread(_post)
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(_post)
+    except Exception:
+        telemetry_send_seconds.observe(time.perf_counter() - start, "error")
+        raise
+    telemetry_send_seconds.observe(time.perf_counter() - start, "ok")
+
+
+def _route(req: StartRequest) -> tuple[list[tuple[float, float]], list[float]]:
+    points = list(req.waypoints) if req.waypoints and len(req.waypoints) >= 2 else [
+        (req.start_lat, req.start_lng),
+        (req.end_lat, req.end_lng),
+    ]
+    cumulative = [0.0]
+    for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+        dx = (lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+        dy = lat2 - lat1
+        cumulative.append(cumulative[-1] + math.hypot(dx, dy) * METERS_PER_DEG)
+    return points, cumulative
+
+
+def _position_at(points: list[tuple[float, float]], cumulative: list[float], progress: float) -> tuple[float, float]:
+    total = cumulative[-1]
+    if total <= 0:
+        return points[-1]
+    target = total * progress
+    for i in range(1, len(cumulative)):
+        if cumulative[i] >= target:
+            seg = cumulative[i] - cumulative[i - 1]
+            t = (target - cumulative[i - 1]) / seg if seg > 0 else 1.0
+            (lat1, lng1), (lat2, lng2) = points[i - 1], points[i]
+            return lat1 + (lat2 - lat1) * t, lng1 + (lng2 - lng1) * t
+    return points[-1]
+
+
+def _flight_seq_base() -> int:
+    global _last_seq_epoch
+    _last_seq_epoch = max(int(time.time() * 1000), _last_seq_epoch + 1)
+    return _last_seq_epoch * SEQ_EPOCH_STRIDE
 
 
 async def _simulate_flight(req: StartRequest) -> None:
     start_time = time.time()
+    points, cumulative = _route(req)
+    seq = _flight_seq_base()
 
     try:
         while True:
@@ -142,9 +218,9 @@ async def _simulate_flight(req: StartRequest) -> None:
             elapsed = now - start_time
             progress = min(1.0, elapsed / req.duration_sec) if req.duration_sec > 0 else 1.0
             delivered = progress >= 1.0
+            seq += 1
 
-            lat = req.start_lat + (req.end_lat - req.start_lat) * progress
-            lng = req.start_lng + (req.end_lng - req.start_lng) * progress
+            lat, lng = _position_at(points, cumulative, progress)
 
             telemetry = {
                 "delivery_id": req.delivery_id,
@@ -153,7 +229,17 @@ async def _simulate_flight(req: StartRequest) -> None:
                 "progress": progress,
                 "status": _build_status(progress, delivered),
                 "timestamp_utc": now,
+                "seq": seq,
+                "remaining_m": cumulative[-1] * (1.0 - progress),
+                "pickup_lat": req.start_lat,
+                "pickup_lng": req.start_lng,
+                "dropoff_lat": req.end_lat,
+                "dropoff_lng": req.end_lng,
             }
+            if req.drone_id:
+                telemetry["drone_id"] = req.drone_id
+            if req.trace_id:
+                telemetry["trace_id"] = req.trace_id
 
             await _send_telemetry(telemetry)
 
@@ -164,29 +250,73 @@ async def _simulate_flight(req: StartRequest) -> None:
     except asyncio.CancelledError:
         pass
     except Exception as exc:
+        flight_errors.inc()
         print(f"Simulator error for {req.delivery_id}: {exc}")
     finally:
         active_flights.pop(req.delivery_id, None)
 
 
-@app.post("/start")
-async def start_simulation(req: StartRequest, _: dict = Depends(_require_simulator_token)):
+def _remember_idempotency_key(key: str) -> bool:
+    if key in _seen_idempotency_keys:
+        _seen_idempotency_keys.move_to_end(key)
+        return False
+    _seen_idempotency_keys[key] = time.time()
+    while len(_seen_idempotency_keys) > IDEMPOTENCY_CACHE_SIZE:
+        _seen_idempotency_keys.popitem(last=False)
+    return True
+
+
+def _start_flight(req: StartRequest) -> str:
+    if req.idempotency_key and not _remember_idempotency_key(req.idempotency_key):
+        return "duplicate"
     existing = active_flights.get(req.delivery_id)
     if existing:
         existing.cancel()
 
     task = asyncio.create_task(_simulate_flight(req))
     active_flights[req.delivery_id] = task
-    return {"status": "started", "delivery_id": req.delivery_id}
+    return "started"
 
 
-@app.post("/cancel")
-async def cancel_simulation(req: CancelRequest, _: dict = Depends(_require_simulator_token)):
-    existing = active_flights.get(req.delivery_id)
+def _cancel_flight(delivery_id: str) -> str:
+    existing = active_flights.get(delivery_id)
     if existing:
         existing.cancel()
-        return {"status": "cancelled", "delivery_id": req.delivery_id}
-    return {"status": "not_found", "delivery_id": req.delivery_id}
+        return "cancelled"
+    return "not_found"
+
+
+@app.post("/start")
+async def start_simulation(req: StartRequest, _: dict = Depends(_require_simulator_token)):
+    return {"status": _start_flight(req), "delivery_id": req.delivery_id}
+
+
+@app.post("/start/batch")
+async def start_simulation_batch(req: BatchStartRequest, _: dict = Depends(_require_simulator_token)):
+    results = []
+    for raw in req.flights:
+        try:
+            flight = StartRequest.model_validate(raw)
+        except ValidationError as exc:
+            results.append({"status": "invalid", "delivery_id": raw.get("delivery_id"), "error": str(exc)})
+            continue
+        results.append({"status": _start_flight(flight), "delivery_id": flight.delivery_id})
+    return {"results": results}
+
+
+@app.post("/cancel")
+async def cancel_simulation(req: CancelRequest, _: dict = Depends(_require_simulator_token)):
+    return {"status": _cancel_flight(req.delivery_id), "delivery_id": req.delivery_id}
+
+
+@app.post("/cancel/batch")
+async def cancel_simulation_batch(req: BatchCancelRequest, _: dict = Depends(_require_simulator_token)):
+    return {"results": [{"status": _cancel_flight(d), "delivery_id": d} for d in req.delivery_ids]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
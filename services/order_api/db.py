@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterator
+
+TimingHook = Callable[[str, float], None]
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.on_timing("execute", time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.on_timing("executemany", time.perf_counter() - start)
+
+
+class _TimedConnection(sqlite3.Connection):
+    on_timing: TimingHook
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.on_timing("commit", time.perf_counter() - start)
+
+
+class DatabaseBackend(ABC):
+    @abstractmethod
+    def connect(self):
+        pass
+
+
+class SQLiteBackend(DatabaseBackend):
+    def __init__(
+        self,
+        path: Path | str,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256,
+        synchronous: str = "NORMAL",
+        on_timing: TimingHook | None = None,
+    ) -> None:
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.synchronous = synchronous
+        self.on_timing = on_timing
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=_TimedConnection if self.on_timing else sqlite3.Connection,
+        )
+        if self.on_timing:
+            conn.on_timing = self.on_timing
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+
+def create_backend(url: str, **options) -> DatabaseBackend:
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):], **options)
+    raise ValueError(f"Unsupported database url: {url}")
+
+
+class ConnectionPool:
+    def __init__(self, backend: DatabaseBackend, max_size: int = 20, acquire_timeout: float = 5.0) -> None:
+        self.backend = backend
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._idle: list = []
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._current: ContextVar = ContextVar(f"db_connection_{id(self)}", default=None)
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError("Timed out waiting for a database connection")
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            try:
+                conn = self.backend.connect()
+            except Exception:
+                self._slots.release()
+                raise
+        return conn
+
+    def _checkin(self, conn) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            conn.close()
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        conn = self._current.get()
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._checkout()
+        token = self._current.set(conn)
+        try:
+            yield conn
+        finally:
+            self._current.reset(token)
+            self._checkin(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
@@ -0,0 +1,348 @@
+import heapq
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG = math.radians(1) * EARTH_RADIUS_M
+
+IDLE = "IDLE"
+BUSY = "BUSY"
+CHARGING = "CHARGING"
+OFFLINE = "OFFLINE"
+
+LatLng = tuple[float, float]
+RouteFn = Callable[[LatLng, LatLng], list[LatLng] | None]
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def path_length_m(points: list[LatLng]) -> float:
+    return sum(haversine_m(a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:]))
+
+
+@dataclass(slots=True)
+class Drone:
+    id: str
+    home_lat: float
+    home_lng: float
+    lat: float
+    lng: float
+    battery_pct: float
+    payload_capacity_g: float
+    state: str = IDLE
+    available_at: float = 0.0
+    updated_at: float = 0.0
+    delivery_id: str | None = None
+
+
+@dataclass(slots=True)
+class DispatchRequest:
+    delivery_id: str
+    pickup_lat: float
+    pickup_lng: float
+    dropoff_lat: float
+    dropoff_lng: float
+    payload_weight_g: float = 0.0
+
+
+@dataclass(slots=True)
+class Assignment:
+    delivery_id: str
+    drone_id: str
+    origin_lat: float
+    origin_lng: float
+    distance_m: float
+    battery_used_pct: float
+    waypoints: list[tuple[float, float]] = field(default_factory=list)
+
+
+class GridIndex:
+    def __init__(self, cell_deg: float) -> None:
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set[str]] = {}
+        self._where: dict[str, tuple[int, int]] = {}
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def insert(self, key: str, lat: float, lng: float) -> None:
+        self.remove(key)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, set()).add(key)
+        self._where[key] = cell
+
+    def remove(self, key: str) -> None:
+        cell = self._where.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def rings(self, lat: float, lng: float, max_ring: int):
+        ci, cj = self._cell(lat, lng)
+        for r in range(max_ring + 1):
+            found = []
+            for i in range(ci - r, ci + r + 1):
+                for j in range(cj - r, cj + r + 1):
+                    if r and ci - r < i < ci + r and cj - r < j < cj + r:
+                        continue
+                    bucket = self._cells.get((i, j))
+                    if bucket:
+                        found.extend(bucket)
+            yield r, found
+
+
+class FleetRegistry:
+    def __init__(
+        self,
+        battery_pct_per_km: float,
+        reserve_battery_pct: float,
+        charge_pct_per_sec: float,
+        cell_deg: float = 0.01,
+        max_search_ring: int = 20,
+        candidates_per_delivery: int = 5,
+        route: RouteFn | None = None,
+    ) -> None:
+        self.battery_pct_per_km = battery_pct_per_km
+        self.reserve_battery_pct = reserve_battery_pct
+        self.charge_pct_per_sec = charge_pct_per_sec
+        self.max_search_ring = max_search_ring
+        self.candidates_per_delivery = candidates_per_delivery
+        self.route = route
+        self.drones: dict[str, Drone] = {}
+        self._idle = GridIndex(cell_deg)
+        self._wakeups: list[tuple[float, str]] = []
+        self._dirty: set[str] = set()
+        self._homes: dict[tuple[float, float], float] = {}
+        self.lock = threading.Lock()
+
+    def load(self, drones: list[Drone], now: float) -> None:
+        with self.lock:
+            self.drones = {d.id: d for d in drones}
+            self._idle = GridIndex(self._idle.cell_deg)
+            self._wakeups = []
+            self._homes = {}
+            for drone in drones:
+                self._place(drone, now)
+                home = (drone.home_lat, drone.home_lng)
+                self._homes[home] = max(self._homes.get(home, 0.0), drone.payload_capacity_g)
+
+    def _place(self, drone: Drone, now: float) -> None:
+        if drone.state == IDLE:
+            self._idle.insert(drone.id, drone.lat, drone.lng)
+        elif drone.state == CHARGING:
+            self._idle.remove(drone.id)
+            heapq.heappush(self._wakeups, (drone.available_at, drone.id))
+        else:
+            self._idle.remove(drone.id)
+
+    def _battery_for(self, distance_m: float) -> float:
+        return distance_m / 1000 * self.battery_pct_per_km
+
+    def refresh(self, now: float) -> None:
+        while self._wakeups and self._wakeups[0][0] <= now:
+            _, drone_id = heapq.heappop(self._wakeups)
+            drone = self.drones.get(drone_id)
+            if drone is None or drone.state != CHARGING or drone.available_at > now:
+                continue
+            drone.battery_pct = 100.0
+            self._make_idle(drone, now)
+
+    def _make_idle(self, drone: Drone, now: float) -> None:
+        drone.state = IDLE
+        drone.updated_at = now
+        self._idle.insert(drone.id, drone.lat, drone.lng)
+        self._dirty.add(drone.id)
+
+    def _path(self, start: LatLng, end: LatLng) -> list[LatLng] | None:
+        if self.route is None:
+            return [start, end]
+        return self.route(start, end)
+
+    def in_range(self, req: DispatchRequest) -> bool:
+        budget_m = (100.0 - self.reserve_battery_pct) / self.battery_pct_per_km * 1000
+        pickup = (req.pickup_lat, req.pickup_lng)
+        dropoff = (req.dropoff_lat, req.dropoff_lng)
+        leg_m = haversine_m(*pickup, *dropoff)
+        planned_leg_m = None
+        for home, capacity_g in list(self._homes.items()):
+            if capacity_g < req.payload_weight_g:
+                continue
+            if haversine_m(*home, *pickup) + leg_m + haversine_m(*dropoff, *home) > budget_m:
+                continue
+            if planned_leg_m is None:
+                leg = self._path(pickup, dropoff)
+                if leg is None:
+                    return False
+                planned_leg_m = path_length_m(leg)
+            approach = self._path(home, pickup)
+            back = self._path(dropoff, home)
+            if approach is None or back is None:
+                continue
+            if path_length_m(approach) + planned_leg_m + path_length_m(back) <= budget_m:
+                return True
+        return False
+
+    def _flight(self, drone: Drone, req: DispatchRequest) -> tuple[list[LatLng], float] | None:
+        approach = self._path((drone.lat, drone.lng), (req.pickup_lat, req.pickup_lng))
+        leg = self._path((req.pickup_lat, req.pickup_lng), (req.dropoff_lat, req.dropoff_lng))
+        back = self._path((req.dropoff_lat, req.dropoff_lng), (drone.home_lat, drone.home_lng))
+        if approach is None or leg is None or back is None:
+            return None
+        waypoints = approach + leg[1:]
+        distance_m = path_length_m(waypoints)
+        if drone.battery_pct - self._battery_for(distance_m + path_length_m(back)) < self.reserve_battery_pct:
+            return None
+        return waypoints, distance_m
+
+    def _candidates(self, req: DispatchRequest, taken: set[str]) -> list[tuple[float, str, float]]:
+        leg_m = haversine_m(req.pickup_lat, req.pickup_lng, req.dropoff_lat, req.dropoff_lng)
+        max_approach_m = (100.0 - self.reserve_battery_pct) / self.battery_pct_per_km * 1000 - leg_m
+        kx = METERS_PER_DEG * math.cos(math.radians(req.pickup_lat))
+        cell_m = self._idle.cell_deg * kx
+        out: list[tuple[float, str, float]] = []
+        if max_approach_m < 0:
+            return out
+        for ring, keys in self._idle.rings(req.pickup_lat, req.pickup_lng, self.max_search_ring):
+            if (ring - 1) * cell_m > max_approach_m:
+                break
+            for drone_id in keys:
+                if drone_id in taken:
+                    continue
+                drone = self.drones[drone_id]
+                if drone.payload_capacity_g < req.payload_weight_g:
+                    continue
+                approach_m = math.hypot((drone.lng - req.pickup_lng) * kx, (drone.lat - req.pickup_lat) * METERS_PER_DEG)
+                if approach_m > max_approach_m:
+                    continue
+                home_m = math.hypot((drone.home_lng - req.dropoff_lng) * kx, (drone.home_lat - req.dropoff_lat) * METERS_PER_DEG)
+                needed = self._battery_for(approach_m + leg_m + home_m)
+                if drone.battery_pct - needed < self.reserve_battery_pct:
+                    continue
+                out.append((approach_m, drone_id, approach_m + leg_m))
+            if len(out) >= self.candidates_per_delivery and ring > 0:
+                break
+        out.sort()
+        return out[: self.candidates_per_delivery]
+
+    def assign(self, requests: list[DispatchRequest], now: float) -> list[Assignment]:
+        with self.lock:
+            self.refresh(now)
+            if not requests or not len(self._idle):
+                return []
+
+            assignments: list[Assignment] = []
+            pending = list(requests)
+            taken: set[str] = set()
+            unroutable: set[tuple[str, str]] = set()
+            for _ in range(2):
+                edges = []
+                reachable: set[int] = set()
+                for idx, req in enumerate(pending):
+                    for approach_m, drone_id, distance_m in self._candidates(req, taken):
+                        edges.append((approach_m, idx, drone_id, distance_m))
+                        reachable.add(idx)
+                if not edges:
+                    break
+                edges.sort()
+                matched: set[int] = set()
+                for approach_m, idx, drone_id, _ in edges:
+                    if idx in matched or drone_id in taken:
+                        continue
+                    req = pending[idx]
+                    if (req.delivery_id, drone_id) in unroutable:
+                        continue
+                    drone = self.drones[drone_id]
+                    flight = self._flight(drone, req)
+                    if flight is None:
+                        unroutable.add((req.delivery_id, drone_id))
+                        continue
+                    waypoints, distance_m = flight
+                    matched.add(idx)
+                    taken.add(drone_id)
+                    assignments.append(
+                        Assignment(
+                            delivery_id=req.delivery_id,
+                            drone_id=drone_id,
+                            origin_lat=drone.lat,
+                            origin_lng=drone.lng,
+                            distance_m=distance_m,
+                            battery_used_pct=self._battery_for(distance_m),
+                            waypoints=waypoints,
+                        )
+                    )
+                pending = [req for idx, req in enumerate(pending) if idx in reachable and idx not in matched]
+                if not pending:
+                    break
+
+            for a in assignments:
+                drone = self.drones[a.drone_id]
+                self._idle.remove(drone.id)
+                drone.state = BUSY
+                drone.delivery_id = a.delivery_id
+                drone.battery_pct -= a.battery_used_pct
+                drone.lat, drone.lng = a.waypoints[-1]
+                drone.updated_at = now
+                self._dirty.add(drone.id)
+            return assignments
+
+    def release(self, drone_id: str, delivery_id: str, now: float) -> None:
+        with self.lock:
+            drone = self.drones.get(drone_id)
+            if drone is None or drone.state != BUSY or drone.delivery_id != delivery_id:
+                return
+            drone.delivery_id = None
+            drone.available_at = now
+            if drone.battery_pct < self.reserve_battery_pct * 2:
+                drone.lat, drone.lng = drone.home_lat, drone.home_lng
+                drone.state = CHARGING
+                drone.available_at = now + (100.0 - drone.battery_pct) / self.charge_pct_per_sec
+                drone.updated_at = now
+                heapq.heappush(self._wakeups, (drone.available_at, drone.id))
+                self._dirty.add(drone.id)
+                return
+            self._make_idle(drone, now)
+
+    def revert(self, assignment: Assignment, now: float) -> None:
+        with self.lock:
+            drone = self.drones.get(assignment.drone_id)
+            if drone is None or drone.state != BUSY or drone.delivery_id != assignment.delivery_id:
+                return
+            drone.state = IDLE
+            drone.delivery_id = None
+            drone.battery_pct += assignment.battery_used_pct
+            drone.lat, drone.lng = assignment.origin_lat, assignment.origin_lng
+            drone.available_at = now
+            drone.updated_at = now
+            self._idle.insert(drone.id, drone.lat, drone.lng)
+            self._dirty.add(drone.id)
+
+    def take_dirty(self) -> list[tuple]:
+        with self.lock:
+            rows = [
+                (d.state, d.lat, d.lng, d.battery_pct, d.available_at, d.updated_at, d.delivery_id, d.id)
+                for d in (self.drones.get(drone_id) for drone_id in self._dirty)
+                if d is not None
+            ]
+            self._dirty.clear()
+            return rows
+
+    def snapshot(self, now: float) -> list[Drone]:
+        with self.lock:
+            self.refresh(now)
+            return list(self.drones.values())
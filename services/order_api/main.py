@@ -1,22 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import sqlite3
 import time
-from typing import List, Optional
+from typing import ContextManager, List, Optional
 from pathlib import Path
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import json
+import logging
 import os
+import threading
 import uuid
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 import jwt
+from cryptography.hazmat.primitives import serialization
+from db import ConnectionPool, create_backend
+from metrics import Registry, RequestMetricsMiddleware
+from fleet import Assignment, Drone, DispatchRequest, FleetRegistry
+from routing import RouteInfeasibleError, RoutePlanner, load_no_fly_zones
+from tracing import TraceStore, new_trace_id
 
 DB_PATH = Path(__file__).parent / "order_api.db"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
 NOMINATIM_BASE = "https://nominatim.openstreetmap.org"
 ALMATY_VIEWBOX = "76.7,43.35,77.1,43.0"
 GEOCODE_TTL_SECONDS = 300
 SIMULATOR_URL = os.getenv("SIMULATOR_URL", "http://127.0.0.1:8001")
+TRACKING_URL = os.getenv("TRACKING_URL", "http://127.0.0.1:8002")
 JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY")
 JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
 JWT_PRIVATE_KEY_PATH = os.getenv("JWT_PRIVATE_KEY_PATH")
@@ -27,6 +43,39 @@ ACCESS_TTL_SECONDS = int(os.getenv("ACCESS_TTL_SECONDS", "900"))
 REFRESH_TTL_SECONDS = int(os.getenv("REFRESH_TTL_SECONDS", "2592000"))
 CORS_ALLOW_ORIGINS = os.getenv("CORS_ALLOW_ORIGINS", "*")
 CLIENT_API_KEY = os.getenv("CLIENT_API_KEY", "demo-client-key")
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+REFRESH_PURGE_INTERVAL_SECONDS = float(os.getenv("REFRESH_PURGE_INTERVAL_SECONDS", "300"))
+REFRESH_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_PURGE_BATCH_SIZE", "1000"))
+REFRESH_REVOCATION_SYNC_SECONDS = float(os.getenv("REFRESH_REVOCATION_SYNC_SECONDS", "5"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "0.5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "1.0"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "60.0"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30.0"))
+OUTBOX_RETENTION_SECONDS = float(os.getenv("OUTBOX_RETENTION_SECONDS", "86400"))
+OUTBOX_PURGE_BATCH_SIZE = int(os.getenv("OUTBOX_PURGE_BATCH_SIZE", "1000"))
+OUTBOX_PURGE_INTERVAL_SECONDS = float(os.getenv("OUTBOX_PURGE_INTERVAL_SECONDS", "300"))
+FLEET_DRONES_PER_STORE = int(os.getenv("FLEET_DRONES_PER_STORE", "3"))
+FLEET_PAYLOAD_CAPACITY_G = float(os.getenv("FLEET_PAYLOAD_CAPACITY_G", "2500"))
+FLEET_BATTERY_PCT_PER_KM = float(os.getenv("FLEET_BATTERY_PCT_PER_KM", "4.0"))
+FLEET_RESERVE_BATTERY_PCT = float(os.getenv("FLEET_RESERVE_BATTERY_PCT", "10.0"))
+FLEET_CHARGE_PCT_PER_SEC = float(os.getenv("FLEET_CHARGE_PCT_PER_SEC", "1.0"))
+FLEET_FLIGHT_SECONDS = float(os.getenv("FLEET_FLIGHT_SECONDS", "10.0"))
+FLEET_DISPATCH_WINDOW_SECONDS = float(os.getenv("FLEET_DISPATCH_WINDOW_SECONDS", "0.2"))
+FLEET_DISPATCH_POLL_SECONDS = float(os.getenv("FLEET_DISPATCH_POLL_SECONDS", "1.0"))
+FLEET_DISPATCH_BATCH_SIZE = int(os.getenv("FLEET_DISPATCH_BATCH_SIZE", "2000"))
+NO_FLY_ZONES_PATH = os.getenv("NO_FLY_ZONES_PATH", str(Path(__file__).parent / "no_fly_zones.json"))
+ROUTE_MARGIN_M = float(os.getenv("ROUTE_MARGIN_M", "50"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "10000"))
+ROUTE_CACHE_QUANTUM_DEG = float(os.getenv("ROUTE_CACHE_QUANTUM_DEG", "0.0005"))
+STATUS_SYNC_INTERVAL_SECONDS = float(os.getenv("STATUS_SYNC_INTERVAL_SECONDS", "1.0"))
+STATUS_SYNC_BATCH_SIZE = int(os.getenv("STATUS_SYNC_BATCH_SIZE", "500"))
+DELIVERIES_LIST_MAX = int(os.getenv("DELIVERIES_LIST_MAX", "1000"))
+BACKGROUND_BACKOFF_MAX_SECONDS = float(os.getenv("BACKGROUND_BACKOFF_MAX_SECONDS", "30"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+TRACE_MAX_DELIVERIES = int(os.getenv("TRACE_MAX_DELIVERIES", "10000"))
+TRACE_MAX_SPANS_PER_DELIVERY = int(os.getenv("TRACE_MAX_SPANS_PER_DELIVERY", "256"))
 
 IMAGE_URLS = [
     "https://images.unsplash.com/photo-1542838132-92c53300491e?auto=format&fit=crop&w=800&q=60",
@@ -41,6 +90,8 @@ IMAGE_URLS = [
     "https://images.unsplash.com/photo-1526318472351-c75fcf070305?auto=format&fit=crop&w=800&q=60",
 ]
 
+logger = logging.getLogger("order_api")
+
 
 class Store(BaseModel):
     id: str
@@ -65,6 +116,7 @@ class DeliveryCreateIn(BaseModel):
     start_lng: float
     end_lat: float
     end_lng: float
+    product_ids: List[str] = []
 
 
 class DeliveryCreateOut(BaseModel):
@@ -73,11 +125,31 @@ class DeliveryCreateOut(BaseModel):
     tracking_refresh_token: str
 
 
+class BulkDeliveryItemOut(BaseModel):
+    index: int
+    delivery_id: str
+    tracking_access_token: str
+    tracking_refresh_token: str
+
+
 class DeliveryStatusOut(BaseModel):
     delivery_id: str
     status: str
 
 
+class DeliveryOut(BaseModel):
+    delivery_id: str
+    store_id: str
+    status: str
+    drone_id: Optional[str] = None
+    start_lat: float
+    start_lng: float
+    end_lat: float
+    end_lng: float
+    created_at: float
+    status_updated_at: Optional[float] = None
+
+
 class RefreshIn(BaseModel):
     refresh_token: str
 
@@ -90,7 +162,38 @@ class GuestTokenOut(BaseModel):
     access_token: str
 
 
-app = FastAPI(title="Order API")
+class TraceHopOut(BaseModel):
+    name: str
+    at: float
+    since_previous_ms: Optional[float] = None
+
+
+class TraceOut(BaseModel):
+    delivery_id: str
+    trace_id: Optional[str] = None
+    hops: List[TraceHopOut]
+    total_ms: float
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    _load_revoked_refresh_tokens()
+    _load_fleet()
+    _start_outbox_dispatcher()
+    _start_fleet_dispatcher()
+    _start_refresh_purger()
+    _start_status_sync()
+    try:
+        yield
+    finally:
+        _stop_status_sync()
+        _stop_refresh_purger()
+        _stop_fleet_dispatcher()
+        _stop_outbox_dispatcher()
+        _db_pool.close()
+
+
+app = FastAPI(title="Order API", lifespan=lifespan)
 
 allow_origins = [o.strip() for o in CORS_ALLOW_ORIGINS.split(",") if o.strip()]
 app.add_middleware(
@@ -101,92 +204,205 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+metrics_registry = Registry()
+http_request_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+jwt_seconds = metrics_registry.histogram("jwt_duration_seconds", "JWT sign/verify latency", ("operation",))
+sqlite_seconds = metrics_registry.histogram("sqlite_duration_seconds", "SQLite execute/commit latency", ("operation",))
+nominatim_seconds = metrics_registry.histogram(
+    "nominatim_request_duration_seconds", "Upstream Nominatim request latency", ("path",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+status_sync_transitions = metrics_registry.counter(
+    "status_sync_transitions_total", "Delivery status transitions consumed from the tracking service"
+)
+nominatim_cache_hits = metrics_registry.counter("nominatim_cache_hits_total", "Geocoding answers served from cache")
+dispatch_failures = metrics_registry.counter(
+    "dispatch_failures_total", "Deliveries marked DISPATCH_FAILED after the simulator start exhausted its retries"
+)
+background_errors = metrics_registry.counter("background_errors_total", "Failed iterations of background loops", ("loop",))
+app.add_middleware(RequestMetricsMiddleware, histogram=http_request_seconds)
+
 _geocode_cache: dict[str, tuple[float, dict | list]] = {}
+_traces = TraceStore(TRACE_MAX_DELIVERIES, TRACE_MAX_SPANS_PER_DELIVERY, TRACE_LOG_PATH)
+
+
+_db_pool = ConnectionPool(
+    create_backend(
+        DATABASE_URL,
+        busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        on_timing=lambda operation, seconds: sqlite_seconds.observe(seconds, operation),
+    ),
+    max_size=DB_POOL_SIZE,
+    acquire_timeout=DB_BUSY_TIMEOUT_MS / 1000,
+)
+
+
+def get_conn() -> ContextManager[sqlite3.Connection]:
+    return _db_pool.connection()
 
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _ensure_column(cur: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    columns = {r["name"] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in columns:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
 
 
 def init_db() -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("PRAGMA foreign_keys = ON")
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS stores(
-          id TEXT PRIMARY KEY,
-          name TEXT,
-          address TEXT,
-          latitude REAL,
-          longitude REAL
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stores(
+              id TEXT PRIMARY KEY,
+              name TEXT,
+              address TEXT,
+              latitude REAL,
+              longitude REAL
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS products(
-          id TEXT PRIMARY KEY,
-          store_id TEXT,
-          title TEXT,
-          price REAL,
-          weight REAL,
-          image_url TEXT
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS products(
+              id TEXT PRIMARY KEY,
+              store_id TEXT,
+              title TEXT,
+              price REAL,
+              weight REAL,
+              image_url TEXT
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS deliveries(
-          delivery_id TEXT PRIMARY KEY,
-          store_id TEXT,
-          start_lat REAL,
-          start_lng REAL,
-          end_lat REAL,
-          end_lng REAL,
-          status TEXT,
-          created_at REAL
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deliveries(
+              delivery_id TEXT PRIMARY KEY,
+              store_id TEXT,
+              start_lat REAL,
+              start_lng REAL,
+              end_lat REAL,
+              end_lng REAL,
+              status TEXT,
+              created_at REAL
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS refresh_tokens(
-          jti TEXT PRIMARY KEY,
-          delivery_id TEXT,
-          expires_at REAL,
-          revoked INTEGER DEFAULT 0
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_tokens(
+              jti TEXT PRIMARY KEY,
+              delivery_id TEXT,
+              expires_at REAL,
+              revoked INTEGER DEFAULT 0
+            )
+            """
         )
-        """
-    )
-    cur.execute("SELECT COUNT(*) FROM stores")
-    if cur.fetchone()[0] == 0:
-        stores_rows = []
-        products_rows = []
-        for i in range(10):
-            base_lat = 43.2920278 + i * 0.002
-            base_lng = 77.001 + i * 0.003
-            sid = f"s{i+1}"
-            store_name = f"AeroMart {i+1}"
-            stores_rows.append((sid, store_name, f"Kaskelen Ave {50+i}", base_lat, base_lng))
-            for j in range(10):
-                pid = f"{sid}_p{j+1}"
-                products_rows.append(
-                    (
-                        pid,
-                        sid,
-                        f"Essentials Pack {j+1} - {store_name}",
-                        1500 + j * 150,
-                        200 + j * 30,
-                        IMAGE_URLS[j % len(IMAGE_URLS)],
-                    )
-                )
-        cur.executemany("INSERT INTO stores VALUES (?,?,?,?,?)", stores_rows)
-        cur.executemany("INSERT INTO products VALUES (?,?,?,?,?,?)", products_rows)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_delivery_id ON refresh_tokens(delivery_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens(expires_at)")
+        _ensure_column(cur, "refresh_tokens", "revoked_at", "REAL")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_revoked_at ON refresh_tokens(revoked_at)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              idempotency_key TEXT UNIQUE,
+              kind TEXT,
+              delivery_id TEXT,
+              payload TEXT,
+              status TEXT,
+              attempts INTEGER DEFAULT 0,
+              next_attempt_at REAL,
+              last_error TEXT,
+              created_at REAL,
+              sent_at REAL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_delivery_id ON outbox(delivery_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status_created_at ON outbox(status, created_at)")
+        _ensure_column(cur, "deliveries", "drone_id", "TEXT")
+        _ensure_column(cur, "deliveries", "payload_weight", "REAL DEFAULT 0")
+        _ensure_column(cur, "deliveries", "trace_id", "TEXT")
+        _ensure_column(cur, "deliveries", "status_updated_at", "REAL")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_status_created_at ON deliveries(status, created_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_store_id_created_at ON deliveries(store_id, created_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_created_at ON deliveries(created_at)")
+        cur.execute("CREATE TABLE IF NOT EXISTS sync_cursors(name TEXT PRIMARY KEY, position INTEGER)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS drones(
+              id TEXT PRIMARY KEY,
+              home_lat REAL,
+              home_lng REAL,
+              lat REAL,
+              lng REAL,
+              battery_pct REAL,
+              payload_capacity_g REAL,
+              state TEXT,
+              available_at REAL,
+              updated_at REAL
+            )
+            """
+        )
+        _ensure_column(cur, "drones", "delivery_id", "TEXT")
         conn.commit()
-    conn.close()
+        cur.execute("SELECT COUNT(*) FROM stores")
+        if cur.fetchone()[0] == 0:
+            stores_rows = []
+            products_rows = []
+            for i in range(10):
+                base_lat = 43.2920278 + i * 0.002
+                base_lng = 77.001 + i * 0.003
+                sid = f"s{i+1}"
+                store_name = f"AeroMart {i+1}"
+                stores_rows.append((sid, store_name, f"Kaskelen Ave {50+i}", base_lat, base_lng))
+                for j in range(10):
+                    pid = f"{sid}_p{j+1}"
+                    products_rows.append(
+                        (
+                            pid,
+                            sid,
+                            f"Essentials Pack {j+1} - {store_name}",
+                            1500 + j * 150,
+                            200 + j * 30,
+                            IMAGE_URLS[j % len(IMAGE_URLS)],
+                        )
+                    )
+            cur.executemany("INSERT INTO stores VALUES (?,?,?,?,?)", stores_rows)
+            cur.executemany("INSERT INTO products VALUES (?,?,?,?,?,?)", products_rows)
+            conn.commit()
+        cur.execute("SELECT COUNT(*) FROM drones")
+        if cur.fetchone()[0] == 0:
+            now = time.time()
+            drone_rows = []
+            for store in cur.execute("SELECT id, latitude, longitude FROM stores ORDER BY id").fetchall():
+                for k in range(FLEET_DRONES_PER_STORE):
+                    drone_rows.append(
+                        (
+                            f"DRN-{store['id']}-{k+1}",
+                            store["latitude"],
+                            store["longitude"],
+                            store["latitude"],
+                            store["longitude"],
+                            100.0,
+                            FLEET_PAYLOAD_CAPACITY_G,
+                            "IDLE",
+                            0.0,
+                            now,
+                        )
+                    )
+            cur.executemany(
+                """
+                INSERT INTO drones (id, home_lat, home_lng, lat, lng, battery_pct, payload_capacity_g, state, available_at, updated_at)
+                VALUES (?,?,?,?,?,?,?,?,?,?)
+                """,
+                drone_rows,
+            )
+            conn.commit()
 
 
 init_db()
@@ -212,6 +428,7 @@ def _nominatim_get(path: str, params: dict) -> dict | list:
     cache_key = f"{path}?{urlencode(params)}"
     cached = _cache_get(cache_key)
     if cached is not None:
+        nominatim_cache_hits.inc()
         return cached
 
     url = f"{NOMINATIM_BASE}{cache_key}"
@@ -222,7 +439,7 @@ def _nominatim_get(path: str, params: dict) -> dict | list:
             "Accept-Language": "ru",
         },
     )
-    with urlopen(req, timeout=10) as resp:
+    with nominatim_seconds.time(path), urlopen(req, timeout=10) as resp:
         payload = json.loads(resp.read().decode("utf-8"))
         _cache_set(cache_key, payload)
         return payload
@@ -247,6 +464,16 @@ def _load_public_key() -> str:
     return _read_key_value(JWT_PUBLIC_KEY, JWT_PUBLIC_KEY_PATH, "JWT_PUBLIC_KEY")
 
 
+@lru_cache(maxsize=1)
+def _signing_key():
+    return serialization.load_pem_private_key(_load_private_key().encode("utf-8"), password=None)
+
+
+@lru_cache(maxsize=1)
+def _verifying_key():
+    return serialization.load_pem_public_key(_load_public_key().encode("utf-8"))
+
+
 def _issue_access_token(subject: str, role: str, scopes: list[str]) -> str:
     now = int(time.time())
     payload = {
@@ -260,46 +487,170 @@ def _issue_access_token(subject: str, role: str, scopes: list[str]) -> str:
         "nbf": now,
         "exp": now + ACCESS_TTL_SECONDS,
     }
-    return jwt.encode(payload, _load_private_key(), algorithm="RS256")
+    return _jwt_encode(payload)
+
+
+def _jwt_encode(payload: dict) -> str:
+    with jwt_seconds.time("sign"):
+        return jwt.encode(payload, _signing_key(), algorithm="RS256")
 
 
-def _issue_refresh_token(delivery_id: str) -> str:
+def _new_refresh_claims(delivery_id: str) -> dict:
     now = int(time.time())
-    jti = str(uuid.uuid4())
-    payload = {
+    return {
         "iss": JWT_ISSUER,
         "aud": JWT_AUDIENCE,
         "sub": delivery_id,
-        "jti": jti,
+        "jti": str(uuid.uuid4()),
         "type": "refresh",
         "iat": now,
         "nbf": now,
         "exp": now + REFRESH_TTL_SECONDS,
     }
-    token = jwt.encode(payload, _load_private_key(), algorithm="RS256")
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO refresh_tokens (jti, delivery_id, expires_at, revoked) VALUES (?, ?, ?, 0)",
-            (jti, delivery_id, now + REFRESH_TTL_SECONDS),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-    return token
 
 
-def _decode_token(token: str) -> dict:
-    return jwt.decode(
-        token,
-        _load_public_key(),
-        algorithms=["RS256"],
-        audience=JWT_AUDIENCE,
-        issuer=JWT_ISSUER,
+def _store_refresh_claims(cur: sqlite3.Cursor, claims: list[dict]) -> None:
+    cur.executemany(
+        "INSERT INTO refresh_tokens (jti, delivery_id, expires_at, revoked) VALUES (?, ?, ?, 0)",
+        [(c["jti"], c["sub"], c["exp"]) for c in claims],
     )
 
 
+_revoked_refresh_jtis: dict[str, float] = {}
+_revoked_refresh_lock = threading.Lock()
+_revoked_refresh_synced_at = 0.0
+
+
+def _load_revoked_refresh_tokens() -> None:
+    global _revoked_refresh_synced_at
+    now = time.time()
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            "SELECT jti, expires_at FROM refresh_tokens WHERE revoked = 1 AND expires_at >= ?",
+            (now,),
+        ).fetchall()
+    with _revoked_refresh_lock:
+        _revoked_refresh_jtis.update({r["jti"]: r["expires_at"] for r in rows})
+    _revoked_refresh_synced_at = now
+
+
+def _sync_revoked_refresh_tokens() -> int:
+    global _revoked_refresh_synced_at
+    now = time.time()
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            "SELECT jti, expires_at FROM refresh_tokens WHERE revoked_at >= ? AND expires_at >= ?",
+            (_revoked_refresh_synced_at - REFRESH_REVOCATION_SYNC_SECONDS, now),
+        ).fetchall()
+    if rows:
+        with _revoked_refresh_lock:
+            _revoked_refresh_jtis.update({r["jti"]: r["expires_at"] for r in rows})
+    _revoked_refresh_synced_at = now
+    return len(rows)
+
+
+def _revoke_delivery_refresh_tokens(cur: sqlite3.Cursor, delivery_id: str) -> list[tuple[str, float]]:
+    return [
+        (r["jti"], r["expires_at"])
+        for r in cur.execute(
+            """
+            UPDATE refresh_tokens SET revoked = 1, revoked_at = ?
+            WHERE delivery_id = ? AND revoked = 0
+            RETURNING jti, expires_at
+            """,
+            (time.time(), delivery_id),
+        ).fetchall()
+    ]
+
+
+def _is_refresh_revoked(jti: str) -> bool:
+    with _revoked_refresh_lock:
+        return jti in _revoked_refresh_jtis
+
+
+def _delete_in_batches(table: str, where: str, params: tuple, batch_size: int, stop: threading.Event) -> int:
+    purged = 0
+    while True:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                DELETE FROM {table} WHERE rowid IN (
+                  SELECT rowid FROM {table} WHERE {where} LIMIT ?
+                )
+                """,
+                (*params, batch_size),
+            )
+            deleted = cur.rowcount
+            conn.commit()
+        purged += deleted
+        if deleted < batch_size or stop.is_set():
+            return purged
+
+
+def _purge_expired_refresh_tokens() -> int:
+    now = time.time()
+    purged = _delete_in_batches("refresh_tokens", "expires_at < ?", (now,), REFRESH_PURGE_BATCH_SIZE, _refresh_purge_stop)
+    with _revoked_refresh_lock:
+        for jti in [j for j, expires_at in _revoked_refresh_jtis.items() if expires_at < now]:
+            del _revoked_refresh_jtis[jti]
+    return purged
+
+
+def _background_failure(loop: str, failures: int, exc: Exception, interval: float) -> float:
+    background_errors.inc(loop)
+    if failures == 1:
+        logger.warning("Background loop %s error: %s", loop, exc)
+    return min(BACKGROUND_BACKOFF_MAX_SECONDS, interval * 2 ** failures)
+
+
+_refresh_purge_stop = threading.Event()
+_refresh_purge_thread: Optional[threading.Thread] = None
+
+
+def _refresh_purge_loop() -> None:
+    failures = 0
+    next_purge_at = 0.0
+    while not _refresh_purge_stop.is_set():
+        try:
+            _sync_revoked_refresh_tokens()
+            if time.monotonic() >= next_purge_at:
+                _purge_expired_refresh_tokens()
+                next_purge_at = time.monotonic() + REFRESH_PURGE_INTERVAL_SECONDS
+        except Exception as exc:
+            failures += 1
+            _refresh_purge_stop.wait(_background_failure("refresh_purge", failures, exc, REFRESH_REVOCATION_SYNC_SECONDS))
+            continue
+        failures = 0
+        _refresh_purge_stop.wait(REFRESH_REVOCATION_SYNC_SECONDS)
+
+
+def _start_refresh_purger() -> None:
+    global _refresh_purge_thread
+    if _refresh_purge_thread and _refresh_purge_thread.is_alive():
+        return
+    _refresh_purge_stop.clear()
+    _refresh_purge_thread = threading.Thread(target=_refresh_purge_loop, name="refresh-token-purger", daemon=True)
+    _refresh_purge_thread.start()
+
+
+def _stop_refresh_purger() -> None:
+    _refresh_purge_stop.set()
+    if _refresh_purge_thread:
+        _refresh_purge_thread.join(timeout=5)
+
+
+def _decode_token(token: str) -> dict:
+    with jwt_seconds.time("verify"):
+        return jwt.decode(
+            token,
+            _verifying_key(),
+            algorithms=["RS256"],
+            audience=JWT_AUDIENCE,
+            issuer=JWT_ISSUER,
+        )
+
+
 def _extract_bearer(authorization: Optional[str]) -> Optional[str]:
     if not authorization:
         return None
@@ -331,30 +682,520 @@ def require_auth(
     return claims
 
 
-def _start_simulation(payload: dict) -> None:
-    data = json.dumps(payload).encode("utf-8")
-    token = _issue_access_token(payload["delivery_id"], "operator", ["simulator:start"])
+def _post_simulator(path: str, body: dict, scopes: list[str]) -> dict:
+    data = json.dumps(body).encode("utf-8")
+    token = _issue_access_token("order_api", "operator", scopes)
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
     req = Request(
-        f"{SIMULATOR_URL.rstrip('/')}/start",
+        f"{SIMULATOR_URL.rstrip('/')}{path}",
         data=data,
         headers=headers,
     )
     with urlopen(req, timeout=5) as resp:
-        resp.read()
+        return json.loads(resp.read().decode("utf-8"))
 
 
-def _cancel_simulation(delivery_id: str) -> None:
-    data = json.dumps({"delivery_id": delivery_id}).encode("utf-8")
-    token = _issue_access_token(delivery_id, "operator", ["simulator:cancel"])
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+def _enqueue_outbox(cur: sqlite3.Cursor, kind: str, delivery_id: str, payload: dict) -> None:
+    _enqueue_outbox_many(cur, kind, [(delivery_id, payload)])
+
+
+def _enqueue_outbox_many(cur: sqlite3.Cursor, kind: str, items: list[tuple[str, dict]]) -> None:
+    now = time.time()
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO outbox (idempotency_key, kind, delivery_id, payload, status, attempts, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, 'PENDING', 0, ?, ?)
+        """,
+        [(f"{kind}:{delivery_id}", kind, delivery_id, json.dumps(payload), now, now) for delivery_id, payload in items],
+    )
+
+
+def _claim_outbox_batch() -> list[sqlite3.Row]:
+    now = time.time()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        rows = cur.execute(
+            """
+            SELECT id, idempotency_key, kind, delivery_id, payload, attempts
+            FROM outbox
+            WHERE status = 'PENDING' AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (now, OUTBOX_BATCH_SIZE),
+        ).fetchall()
+        if rows:
+            cur.executemany(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + OUTBOX_LEASE_SECONDS, r["id"]) for r in rows],
+            )
+        conn.commit()
+        return rows
+
+
+def _mark_outbox_sent(rows: list[sqlite3.Row]) -> None:
+    now = time.time()
+    with get_conn() as conn:
+        conn.cursor().executemany(
+            "UPDATE outbox SET status = 'SENT', sent_at = ?, last_error = NULL WHERE id = ?",
+            [(now, r["id"]) for r in rows],
+        )
+        conn.commit()
+
+
+def _fail_dispatch(cur: sqlite3.Cursor, delivery_ids: list[str], now: float) -> list[str]:
+    failed = []
+    for delivery_id in delivery_ids:
+        row = cur.execute(
+            """
+            UPDATE deliveries SET status = 'DISPATCH_FAILED', status_updated_at = ?
+            WHERE delivery_id = ? AND status = 'ASSIGNED'
+            RETURNING drone_id
+            """,
+            (now, delivery_id),
+        ).fetchone()
+        if row is None:
+            continue
+        failed.append(delivery_id)
+        if row["drone_id"]:
+            _fleet.release(row["drone_id"], delivery_id, now)
+    if failed:
+        _persist_drones(cur)
+    return failed
+
+
+def _mark_outbox_failed(rows: list[sqlite3.Row], error: str, permanent: bool = False) -> None:
+    now = time.time()
+    updates = []
+    exhausted: dict[str, Optional[str]] = {}
+    for r in rows:
+        attempts = r["attempts"] + 1
+        status = "FAILED" if permanent or attempts >= OUTBOX_MAX_ATTEMPTS else "PENDING"
+        delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+        updates.append((status, attempts, now + delay, error[:500], r["id"]))
+        if status == "FAILED" and r["kind"] == "start":
+            exhausted[r["delivery_id"]] = json.loads(r["payload"]).get("trace_id")
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ? AND status = 'PENDING'",
+                updates,
+            )
+            failed = _fail_dispatch(cur, list(exhausted), now) if exhausted else []
+            conn.commit()
+    except Exception:
+        if exhausted:
+            _load_fleet()
+        raise
+    for delivery_id in failed:
+        dispatch_failures.inc()
+        _traces.record(delivery_id, exhausted[delivery_id], "simulator.dispatch_failed", at=now, error=error[:500])
+
+
+def _apply_outbox_results(rows: list[sqlite3.Row], results: list[dict]) -> list[sqlite3.Row]:
+    by_delivery = {r.get("delivery_id"): r for r in results}
+    sent = []
+    missing = []
+    for row in rows:
+        result = by_delivery.get(row["delivery_id"])
+        if result is None:
+            missing.append(row)
+        elif result.get("status") == "invalid":
+            _mark_outbox_failed([row], f"Rejected by simulator: {result.get('error')}", permanent=True)
+        else:
+            sent.append(row)
+    if sent:
+        _mark_outbox_sent(sent)
+    if missing:
+        _mark_outbox_failed(missing, "Missing from simulator response")
+    return sent
+
+
+def _dispatch_outbox_rows(rows: list[sqlite3.Row]) -> None:
+    starts = [r for r in rows if r["kind"] == "start"]
+    cancels = [r for r in rows if r["kind"] == "cancel"]
+    if starts:
+        flights = [{**json.loads(r["payload"]), "idempotency_key": r["idempotency_key"]} for r in starts]
+        try:
+            data = _post_simulator("/start/batch", {"flights": flights}, ["simulator:start"])
+        except Exception as exc:
+            _mark_outbox_failed(starts, str(exc))
+        else:
+            sent = _apply_outbox_results(starts, data.get("results", []))
+            trace_ids = {f["delivery_id"]: f.get("trace_id") for f in flights}
+            now = time.time()
+            for r in sent:
+                _traces.record(r["delivery_id"], trace_ids.get(r["delivery_id"]), "simulator.dispatched", at=now, attempt=r["attempts"] + 1)
+    if cancels:
+        delivery_ids = [r["delivery_id"] for r in cancels]
+        try:
+            data = _post_simulator("/cancel/batch", {"delivery_ids": delivery_ids}, ["simulator:cancel"])
+        except Exception as exc:
+            _mark_outbox_failed(cancels, str(exc))
+        else:
+            _apply_outbox_results(cancels, data.get("results", []))
+
+
+def _purge_outbox() -> int:
+    return _delete_in_batches(
+        "outbox",
+        "status IN ('SENT', 'SKIPPED') AND created_at < ?",
+        (time.time() - OUTBOX_RETENTION_SECONDS,),
+        OUTBOX_PURGE_BATCH_SIZE,
+        _outbox_stop,
+    )
+
+
+def _drain_outbox() -> int:
+    rows = _claim_outbox_batch()
+    if rows:
+        _dispatch_outbox_rows(rows)
+    return len(rows)
+
+
+_outbox_wakeup = threading.Event()
+_outbox_stop = threading.Event()
+_outbox_thread: Optional[threading.Thread] = None
+
+
+def _outbox_loop() -> None:
+    failures = 0
+    purge_failures = 0
+    next_purge_at = 0.0
+    while not _outbox_stop.is_set():
+        if time.monotonic() >= next_purge_at:
+            try:
+                _purge_outbox()
+            except Exception as exc:
+                purge_failures += 1
+                delay = _background_failure("outbox_purge", purge_failures, exc, OUTBOX_PURGE_INTERVAL_SECONDS)
+            else:
+                purge_failures = 0
+                delay = OUTBOX_PURGE_INTERVAL_SECONDS
+            next_purge_at = time.monotonic() + delay
+        try:
+            drained = _drain_outbox()
+        except Exception as exc:
+            failures += 1
+            _outbox_stop.wait(_background_failure("outbox", failures, exc, OUTBOX_POLL_INTERVAL_SECONDS))
+            continue
+        failures = 0
+        if drained >= OUTBOX_BATCH_SIZE:
+            continue
+        _outbox_wakeup.wait(OUTBOX_POLL_INTERVAL_SECONDS)
+        _outbox_wakeup.clear()
+
+
+def _start_outbox_dispatcher() -> None:
+    global _outbox_thread
+    if _outbox_thread and _outbox_thread.is_alive():
+        return
+    _outbox_stop.clear()
+    _outbox_thread = threading.Thread(target=_outbox_loop, name="outbox-dispatcher", daemon=True)
+    _outbox_thread.start()
+
+
+def _stop_outbox_dispatcher() -> None:
+    _outbox_stop.set()
+    _outbox_wakeup.set()
+    if _outbox_thread:
+        _outbox_thread.join(timeout=5)
+
+
+def _get_tracking(path: str, params: dict) -> dict:
+    token = _issue_access_token("order_api", "operator", ["tracking:read"])
     req = Request(
-        f"{SIMULATOR_URL.rstrip('/')}/cancel",
-        data=data,
-        headers=headers,
+        f"{TRACKING_URL.rstrip('/')}{path}?{urlencode(params)}",
+        headers={"Authorization": f"Bearer {token}"},
     )
     with urlopen(req, timeout=5) as resp:
-        resp.read()
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def _load_sync_cursor(name: str) -> int:
+    with get_conn() as conn:
+        row = conn.cursor().execute("SELECT position FROM sync_cursors WHERE name = ?", (name,)).fetchone()
+    return row["position"] if row else 0
+
+
+def _apply_status_transitions(transitions: list[dict], next_after: int) -> None:
+    latest = {t["delivery_id"]: t for t in transitions}
+    released = False
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            for t in latest.values():
+                row = cur.execute(
+                    """
+                    UPDATE deliveries SET status = ?, status_updated_at = ?
+                    WHERE delivery_id = ? AND status NOT IN ('CANCELLED', 'DELIVERED', 'DISPATCH_FAILED')
+                    RETURNING drone_id
+                    """,
+                    (t["status"], t["timestamp_utc"], t["delivery_id"]),
+                ).fetchone()
+                if row is not None and row["drone_id"] and t["status"] in ("DELIVERED", "CANCELLED"):
+                    _fleet.release(row["drone_id"], t["delivery_id"], time.time())
+                    released = True
+            if released:
+                _persist_drones(cur)
+            cur.execute(
+                """
+                INSERT INTO sync_cursors (name, position) VALUES ('tracking_status', ?)
+                ON CONFLICT(name) DO UPDATE SET position = excluded.position
+                """,
+                (next_after,),
+            )
+            conn.commit()
+    except Exception:
+        if released:
+            _load_fleet()
+        raise
+
+
+def _sync_delivery_statuses() -> int:
+    after = _load_sync_cursor("tracking_status")
+    data = _get_tracking("/status-transitions", {"after": after, "limit": STATUS_SYNC_BATCH_SIZE})
+    transitions = data.get("transitions", [])
+    if transitions:
+        _apply_status_transitions(transitions, data["next_after"])
+        status_sync_transitions.inc(amount=len(transitions))
+    return len(transitions)
+
+
+_status_sync_wakeup = threading.Event()
+_status_sync_stop = threading.Event()
+_status_sync_thread: Optional[threading.Thread] = None
+
+
+def _status_sync_loop() -> None:
+    failures = 0
+    while not _status_sync_stop.is_set():
+        try:
+            synced = _sync_delivery_statuses()
+        except Exception as exc:
+            failures += 1
+            _status_sync_stop.wait(_background_failure("status_sync", failures, exc, STATUS_SYNC_INTERVAL_SECONDS))
+            continue
+        failures = 0
+        if synced >= STATUS_SYNC_BATCH_SIZE:
+            continue
+        _status_sync_wakeup.wait(STATUS_SYNC_INTERVAL_SECONDS)
+        _status_sync_wakeup.clear()
+
+
+def _start_status_sync() -> None:
+    global _status_sync_thread
+    if _status_sync_thread and _status_sync_thread.is_alive():
+        return
+    _status_sync_stop.clear()
+    _status_sync_thread = threading.Thread(target=_status_sync_loop, name="status-sync", daemon=True)
+    _status_sync_thread.start()
+
+
+def _stop_status_sync() -> None:
+    _status_sync_stop.set()
+    _status_sync_wakeup.set()
+    if _status_sync_thread:
+        _status_sync_thread.join(timeout=5)
+
+
+_route_planner = RoutePlanner(
+    load_no_fly_zones(NO_FLY_ZONES_PATH),
+    margin_m=ROUTE_MARGIN_M,
+    cache_size=ROUTE_CACHE_SIZE,
+    quantum_deg=ROUTE_CACHE_QUANTUM_DEG,
+)
+
+
+def _check_routes(items: list[DeliveryCreateIn]) -> None:
+    for index, item in enumerate(items):
+        try:
+            _route_planner.plan((item.start_lat, item.start_lng), (item.end_lat, item.end_lng))
+        except RouteInfeasibleError as exc:
+            detail = str(exc) if len(items) == 1 else f"Delivery {index}: {exc}"
+            raise HTTPException(status_code=422, detail=detail)
+
+
+def _planned_route(start: tuple[float, float], end: tuple[float, float]) -> Optional[list[tuple[float, float]]]:
+    try:
+        return _route_planner.plan(start, end)
+    except RouteInfeasibleError:
+        return None
+
+
+_fleet = FleetRegistry(
+    battery_pct_per_km=FLEET_BATTERY_PCT_PER_KM,
+    reserve_battery_pct=FLEET_RESERVE_BATTERY_PCT,
+    charge_pct_per_sec=FLEET_CHARGE_PCT_PER_SEC,
+    route=_planned_route,
+)
+
+
+def _start_payload(assignment: Assignment, delivery: sqlite3.Row) -> dict:
+    pickup = (delivery["start_lat"], delivery["start_lng"])
+    dropoff = (delivery["end_lat"], delivery["end_lng"])
+    return {
+        "delivery_id": assignment.delivery_id,
+        "drone_id": assignment.drone_id,
+        "start_lat": pickup[0],
+        "start_lng": pickup[1],
+        "end_lat": dropoff[0],
+        "end_lng": dropoff[1],
+        "waypoints": assignment.waypoints,
+        "duration_sec": FLEET_FLIGHT_SECONDS,
+        "trace_id": delivery["trace_id"],
+    }
+
+
+def _load_fleet() -> None:
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            """
+            SELECT id, home_lat, home_lng, lat, lng, battery_pct, payload_capacity_g, state, available_at, updated_at, delivery_id
+            FROM drones
+            """
+        ).fetchall()
+    _fleet.load([Drone(**dict(r)) for r in rows], time.time())
+
+
+def _payload_weights(cur: sqlite3.Cursor, items: list[DeliveryCreateIn]) -> list[float]:
+    product_ids = {pid for item in items for pid in item.product_ids}
+    weights: dict[str, float] = {}
+    if product_ids:
+        placeholders = ",".join("?" * len(product_ids))
+        weights = {
+            r["id"]: r["weight"]
+            for r in cur.execute(f"SELECT id, weight FROM products WHERE id IN ({placeholders})", tuple(product_ids)).fetchall()
+        }
+    missing = product_ids - weights.keys()
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Unknown products: {', '.join(sorted(missing))}")
+    totals = [sum(weights[pid] for pid in item.product_ids) for item in items]
+    if any(total > FLEET_PAYLOAD_CAPACITY_G for total in totals):
+        raise HTTPException(status_code=422, detail="Payload exceeds drone capacity")
+    return totals
+
+
+def _dispatch_request(delivery_id: str, row, payload_weight: float) -> DispatchRequest:
+    return DispatchRequest(
+        delivery_id=delivery_id,
+        pickup_lat=row["start_lat"],
+        pickup_lng=row["start_lng"],
+        dropoff_lat=row["end_lat"],
+        dropoff_lng=row["end_lng"],
+        payload_weight_g=payload_weight,
+    )
+
+
+def _check_range(items: list[DeliveryCreateIn], weights: list[float]) -> None:
+    for index, (item, weight) in enumerate(zip(items, weights)):
+        if not _fleet.in_range(_dispatch_request(str(index), item.model_dump(), weight)):
+            detail = "Delivery is out of drone range" if len(items) == 1 else f"Delivery {index}: out of drone range"
+            raise HTTPException(status_code=422, detail=detail)
+
+
+def _dispatch_pending_deliveries() -> int:
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            """
+            SELECT delivery_id, start_lat, start_lng, end_lat, end_lng, payload_weight, trace_id
+            FROM deliveries
+            WHERE status = 'CREATED'
+            ORDER BY created_at
+            LIMIT ?
+            """,
+            (FLEET_DISPATCH_BATCH_SIZE,),
+        ).fetchall()
+    if not rows:
+        return 0
+    requests = [_dispatch_request(r["delivery_id"], r, r["payload_weight"] or 0.0) for r in rows]
+    unassignable = [req.delivery_id for req in requests if not _fleet.in_range(req)]
+    if unassignable:
+        skip = set(unassignable)
+        requests = [req for req in requests if req.delivery_id not in skip]
+
+    now = time.time()
+    by_id = {r["delivery_id"]: r for r in rows}
+    assignments = _fleet.assign(requests, now)
+    try:
+        payloads = {a.delivery_id: _start_payload(a, by_id[a.delivery_id]) for a in assignments}
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            if unassignable:
+                cur.executemany(
+                    "UPDATE deliveries SET status = 'UNASSIGNABLE', status_updated_at = ? WHERE delivery_id = ? AND status = 'CREATED'",
+                    [(now, delivery_id) for delivery_id in unassignable],
+                )
+            applied = []
+            for a in assignments:
+                cur.execute(
+                    "UPDATE deliveries SET status = 'ASSIGNED', drone_id = ?, status_updated_at = ? WHERE delivery_id = ? AND status = 'CREATED'",
+                    (a.drone_id, now, a.delivery_id),
+                )
+                if cur.rowcount:
+                    applied.append(a)
+                else:
+                    _fleet.revert(a, now)
+            if applied:
+                _enqueue_outbox_many(cur, "start", [(a.delivery_id, payloads[a.delivery_id]) for a in applied])
+            _persist_drones(cur)
+            conn.commit()
+    except Exception:
+        _load_fleet()
+        raise
+    for a in applied:
+        _traces.record(a.delivery_id, by_id[a.delivery_id]["trace_id"], "fleet.assigned", at=now, drone_id=a.drone_id)
+    if applied:
+        _outbox_wakeup.set()
+    return len(applied)
+
+
+def _persist_drones(cur: sqlite3.Cursor) -> None:
+    dirty = _fleet.take_dirty()
+    if dirty:
+        cur.executemany(
+            "UPDATE drones SET state = ?, lat = ?, lng = ?, battery_pct = ?, available_at = ?, updated_at = ?, delivery_id = ? WHERE id = ?",
+            dirty,
+        )
+
+
+_fleet_wakeup = threading.Event()
+_fleet_stop = threading.Event()
+_fleet_thread: Optional[threading.Thread] = None
+
+
+def _fleet_dispatch_loop() -> None:
+    failures = 0
+    while not _fleet_stop.is_set():
+        if _fleet_wakeup.wait(FLEET_DISPATCH_POLL_SECONDS):
+            _fleet_stop.wait(FLEET_DISPATCH_WINDOW_SECONDS)
+        _fleet_wakeup.clear()
+        try:
+            _dispatch_pending_deliveries()
+        except Exception as exc:
+            failures += 1
+            _fleet_stop.wait(_background_failure("fleet_dispatch", failures, exc, FLEET_DISPATCH_POLL_SECONDS))
+        else:
+            failures = 0
+
+
+def _start_fleet_dispatcher() -> None:
+    global _fleet_thread
+    if _fleet_thread and _fleet_thread.is_alive():
+        return
+    _fleet_stop.clear()
+    _fleet_thread = threading.Thread(target=_fleet_dispatch_loop, name="fleet-dispatcher", daemon=True)
+    _fleet_thread.start()
+
+
+def _stop_fleet_dispatcher() -> None:
+    _fleet_stop.set()
+    _fleet_wakeup.set()
+    if _fleet_thread:
+        _fleet_thread.join(timeout=5)
 
 
 @app.post("/auth/guest", response_model=GuestTokenOut)
@@ -372,13 +1213,18 @@ def create_delivery(
     claims: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, scopes=["deliveries:create"])),
 ):
     delivery_id = f"DLV-{uuid.uuid4().hex[:10]}"
-    conn = get_conn()
-    try:
+    trace_id = new_trace_id()
+    created_at = time.time()
+    refresh_claims = _new_refresh_claims(delivery_id)
+    with get_conn() as conn:
         cur = conn.cursor()
+        (payload_weight,) = _payload_weights(cur, [payload])
+        _check_routes([payload])
+        _check_range([payload], [payload_weight])
         cur.execute(
             """
-            INSERT INTO deliveries (delivery_id, store_id, start_lat, start_lng, end_lat, end_lng, status, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO deliveries (delivery_id, store_id, start_lat, start_lng, end_lat, end_lng, status, created_at, payload_weight, trace_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 delivery_id,
@@ -388,32 +1234,113 @@ def create_delivery(
                 payload.end_lat,
                 payload.end_lng,
                 "CREATED",
-                time.time(),
+                created_at,
+                payload_weight,
+                trace_id,
             ),
         )
+        _store_refresh_claims(cur, [refresh_claims])
         conn.commit()
-    finally:
-        conn.close()
-
-    _start_simulation(
-        {
-            "delivery_id": delivery_id,
-            "start_lat": payload.start_lat,
-            "start_lng": payload.start_lng,
-            "end_lat": payload.end_lat,
-            "end_lng": payload.end_lng,
-        }
-    )
+    _traces.record(delivery_id, trace_id, "order.created", at=created_at)
+    _fleet_wakeup.set()
 
     access_token = _issue_access_token(delivery_id, "customer", ["tracking:read", "deliveries:cancel"])
-    refresh_token = _issue_refresh_token(delivery_id)
     return DeliveryCreateOut(
         delivery_id=delivery_id,
         tracking_access_token=access_token,
-        tracking_refresh_token=refresh_token,
+        tracking_refresh_token=_jwt_encode(refresh_claims),
     )
 
 
+@app.post("/deliveries/bulk", response_class=StreamingResponse)
+def create_deliveries_bulk(
+    payload: List[DeliveryCreateIn],
+    claims: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, scopes=["deliveries:create"])),
+):
+    if not payload:
+        raise HTTPException(status_code=422, detail="Empty delivery list")
+    if len(payload) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} deliveries per request")
+
+    now = time.time()
+    delivery_ids = [f"DLV-{uuid.uuid4().hex[:10]}" for _ in payload]
+    trace_ids = [new_trace_id() for _ in payload]
+    refresh_claims = [_new_refresh_claims(delivery_id) for delivery_id in delivery_ids]
+    with get_conn() as conn:
+        cur = conn.cursor()
+        weights = _payload_weights(cur, payload)
+        _check_routes(payload)
+        _check_range(payload, weights)
+        cur.executemany(
+            """
+            INSERT INTO deliveries (delivery_id, store_id, start_lat, start_lng, end_lat, end_lng, status, created_at, payload_weight, trace_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (delivery_id, item.store_id, item.start_lat, item.start_lng, item.end_lat, item.end_lng, "CREATED", now, weight, trace_id)
+                for delivery_id, item, weight, trace_id in zip(delivery_ids, payload, weights, trace_ids)
+            ],
+        )
+        _store_refresh_claims(cur, refresh_claims)
+        conn.commit()
+    for delivery_id, trace_id in zip(delivery_ids, trace_ids):
+        _traces.record(delivery_id, trace_id, "order.created", at=now)
+    _fleet_wakeup.set()
+
+    def _stream():
+        for index, (delivery_id, refresh) in enumerate(zip(delivery_ids, refresh_claims)):
+            item = BulkDeliveryItemOut(
+                index=index,
+                delivery_id=delivery_id,
+                tracking_access_token=_issue_access_token(delivery_id, "customer", ["tracking:read", "deliveries:cancel"]),
+                tracking_refresh_token=_jwt_encode(refresh),
+            )
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/deliveries", response_model=List[DeliveryOut])
+def list_deliveries(
+    status: Optional[str] = None,
+    store_id: Optional[str] = None,
+    created_from: Optional[float] = None,
+    created_to: Optional[float] = None,
+    limit: int = Query(default=100, gt=0),
+    offset: int = Query(default=0, ge=0),
+    _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"])),
+):
+    clauses = []
+    params: list = []
+    statuses = [s.strip().upper() for s in (status or "").split(",") if s.strip()]
+    if statuses:
+        clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if store_id:
+        clauses.append("store_id = ?")
+        params.append(store_id)
+    if created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(created_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.extend((min(limit, DELIVERIES_LIST_MAX), offset))
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            f"""
+            SELECT delivery_id, store_id, status, drone_id, start_lat, start_lng, end_lat, end_lng, created_at, status_updated_at
+            FROM deliveries
+            {where}
+            ORDER BY created_at DESC
+            LIMIT ? OFFSET ?
+            """,
+            tuple(params),
+        ).fetchall()
+    return [DeliveryOut(**dict(r)) for r in rows]
+
+
 @app.post("/deliveries/{delivery_id}/cancel", response_model=DeliveryStatusOut)
 def cancel_delivery(
     delivery_id: str,
@@ -421,21 +1348,36 @@ def cancel_delivery(
 ):
     if claims.get("sub") != delivery_id:
         raise HTTPException(status_code=403, detail="Invalid delivery scope")
-    conn = get_conn()
-    try:
+    with get_conn() as conn:
         cur = conn.cursor()
+        row = cur.execute(
+            """
+            UPDATE deliveries SET status = ?, status_updated_at = ?
+            WHERE delivery_id = ? AND status NOT IN ('DELIVERED', 'CANCELLED', 'DISPATCH_FAILED')
+            RETURNING drone_id
+            """,
+            ("CANCELLED", time.time(), delivery_id),
+        ).fetchone()
+        if row is None:
+            current = cur.execute("SELECT status FROM deliveries WHERE delivery_id = ?", (delivery_id,)).fetchone()
+            if current is None:
+                raise HTTPException(status_code=404, detail="Delivery not found")
+            raise HTTPException(status_code=409, detail=f"Delivery is already {current['status']}")
+        drone_id = row["drone_id"]
         cur.execute(
-            "UPDATE deliveries SET status = ? WHERE delivery_id = ?",
-            ("CANCELLED", delivery_id),
+            "UPDATE outbox SET status = 'SKIPPED' WHERE kind = 'start' AND delivery_id = ? AND status = 'PENDING'",
+            (delivery_id,),
         )
+        _enqueue_outbox(cur, "cancel", delivery_id, {"delivery_id": delivery_id})
+        revoked = _revoke_delivery_refresh_tokens(cur, delivery_id)
+        if drone_id:
+            _fleet.release(drone_id, delivery_id, time.time())
+            _persist_drones(cur)
         conn.commit()
-    finally:
-        conn.close()
-
-    try:
-        _cancel_simulation(delivery_id)
-    except Exception:
-        pass
+    _outbox_wakeup.set()
+    if revoked:
+        with _revoked_refresh_lock:
+            _revoked_refresh_jtis.update(revoked)
 
     return DeliveryStatusOut(delivery_id=delivery_id, status="CANCELLED")
 
@@ -454,21 +1396,8 @@ def refresh_access_token(payload: RefreshIn):
     if not jti or not delivery_id:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        row = cur.execute(
-            "SELECT revoked, expires_at FROM refresh_tokens WHERE jti = ?",
-            (jti,),
-        ).fetchone()
-        if not row:
-            raise HTTPException(status_code=401, detail="Refresh token not found")
-        if row["revoked"]:
-            raise HTTPException(status_code=401, detail="Refresh token revoked")
-        if row["expires_at"] < time.time():
-            raise HTTPException(status_code=401, detail="Refresh token expired")
-    finally:
-        conn.close()
+    if _is_refresh_revoked(jti):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
 
     access_token = _issue_access_token(delivery_id, "customer", ["tracking:read"])
     return RefreshOut(access_token=access_token)
@@ -476,27 +1405,24 @@ def refresh_access_token(payload: RefreshIn):
 
 @app.get("/stores", response_model=List[Store])
 def get_stores():
-    conn = get_conn()
-    cur = conn.cursor()
-    rows = cur.execute("SELECT id, name, address, latitude, longitude FROM stores").fetchall()
-    conn.close()
+    with get_conn() as conn:
+        rows = conn.cursor().execute("SELECT id, name, address, latitude, longitude FROM stores").fetchall()
     return [Store(**dict(r)) for r in rows]
 
 
 @app.get("/products", response_model=List[Product])
 def get_products(store_id: Optional[str] = None):
-    conn = get_conn()
-    cur = conn.cursor()
-    if store_id:
-        rows = cur.execute(
-            "SELECT id, store_id as storeId, title, price, weight, image_url as imageUrl FROM products WHERE store_id = ?",
-            (store_id,),
-        ).fetchall()
-    else:
-        rows = cur.execute(
-            "SELECT id, store_id as storeId, title, price, weight, image_url as imageUrl FROM products",
-        ).fetchall()
-    conn.close()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        if store_id:
+            rows = cur.execute(
+                "SELECT id, store_id as storeId, title, price, weight, image_url as imageUrl FROM products WHERE store_id = ?",
+                (store_id,),
+            ).fetchall()
+        else:
+            rows = cur.execute(
+                "SELECT id, store_id as storeId, title, price, weight, image_url as imageUrl FROM products",
+            ).fetchall()
     return [Product(**dict(r)) for r in rows]
 
 
@@ -542,6 +1468,40 @@ def reverse_geocode(lat: float, lng: float):
         raise HTTPException(status_code=502, detail=f"Reverse geocoding failed: {exc}")
 
 
+@app.get("/traces/{delivery_id}", response_model=TraceOut)
+def get_trace(delivery_id: str, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"]))):
+    spans = _traces.get(delivery_id)
+    if not spans:
+        with get_conn() as conn:
+            row = conn.cursor().execute(
+                "SELECT trace_id, created_at FROM deliveries WHERE delivery_id = ?",
+                (delivery_id,),
+            ).fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Delivery not found")
+        spans = [{"trace_id": row["trace_id"], "name": "order.created", "at": row["created_at"]}]
+    spans = sorted(spans, key=lambda s: s["at"])
+    hops = [
+        TraceHopOut(
+            name=span["name"],
+            at=span["at"],
+            since_previous_ms=(span["at"] - spans[i - 1]["at"]) * 1000 if i else None,
+        )
+        for i, span in enumerate(spans)
+    ]
+    return TraceOut(
+        delivery_id=delivery_id,
+        trace_id=spans[0]["trace_id"],
+        hops=hops,
+        total_ms=(spans[-1]["at"] - spans[0]["at"]) * 1000,
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 def root():
     return {"status": "ok"}
@@ -0,0 +1,226 @@
+import heapq
+import json
+import math
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG = math.radians(1) * EARTH_RADIUS_M
+
+LatLng = tuple[float, float]
+
+
+class RouteInfeasibleError(Exception):
+    pass
+
+
+def load_no_fly_zones(path: Path | str | None) -> list[list[LatLng]]:
+    if not path or not Path(path).exists():
+        return []
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    zones: list[list[LatLng]] = []
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            rings = [geometry["coordinates"][0]]
+        elif geometry.get("type") == "MultiPolygon":
+            rings = [poly[0] for poly in geometry["coordinates"]]
+        else:
+            continue
+        for ring in rings:
+            points = [(float(lat), float(lng)) for lng, lat in ring]
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+            if len(points) >= 3:
+                zones.append(points)
+    return zones
+
+
+def _cross(ox: float, oy: float, ax: float, ay: float, bx: float, by: float) -> float:
+    return (ax - ox) * (by - oy) - (ay - oy) * (bx - ox)
+
+
+def _segments_cross(p1, p2, q1, q2) -> bool:
+    d1 = _cross(q1[0], q1[1], q2[0], q2[1], p1[0], p1[1])
+    d2 = _cross(q1[0], q1[1], q2[0], q2[1], p2[0], p2[1])
+    d3 = _cross(p1[0], p1[1], p2[0], p2[1], q1[0], q1[1])
+    d4 = _cross(p1[0], p1[1], p2[0], p2[1], q2[0], q2[1])
+    return ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0)) and d1 != 0 and d2 != 0 and d3 != 0 and d4 != 0
+
+
+class _Polygon:
+    __slots__ = ("points", "min_x", "min_y", "max_x", "max_y")
+
+    def __init__(self, points: list[tuple[float, float]]) -> None:
+        self.points = points
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        self.min_x, self.max_x = min(xs), max(xs)
+        self.min_y, self.max_y = min(ys), max(ys)
+
+    def contains(self, x: float, y: float) -> bool:
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return False
+        inside = False
+        pts = self.points
+        j = len(pts) - 1
+        for i in range(len(pts)):
+            xi, yi = pts[i]
+            xj, yj = pts[j]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+    def blocks(self, a: tuple[float, float], b: tuple[float, float]) -> bool:
+        if max(a[0], b[0]) < self.min_x or min(a[0], b[0]) > self.max_x:
+            return False
+        if max(a[1], b[1]) < self.min_y or min(a[1], b[1]) > self.max_y:
+            return False
+        pts = self.points
+        for i in range(len(pts)):
+            if _segments_cross(a, b, pts[i - 1], pts[i]):
+                return True
+        return self.contains((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+
+
+class RoutePlanner:
+    def __init__(
+        self,
+        zones: list[list[LatLng]],
+        margin_m: float = 50.0,
+        cache_size: int = 10000,
+        quantum_deg: float = 0.0005,
+    ) -> None:
+        self.cache_size = cache_size
+        self.quantum_deg = quantum_deg
+        self._cache: OrderedDict[tuple[int, int, int, int], list[LatLng]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        all_points = [p for zone in zones for p in zone]
+        self.lat0 = sum(p[0] for p in all_points) / len(all_points) if all_points else 0.0
+        self.lng0 = sum(p[1] for p in all_points) / len(all_points) if all_points else 0.0
+        self.kx = METERS_PER_DEG * math.cos(math.radians(self.lat0))
+
+        self.polygons = [_Polygon([self._project(p) for p in zone]) for zone in zones]
+        self.nodes = self._inflated_vertices(margin_m)
+        self.edges: list[list[tuple[int, float]]] = [[] for _ in self.nodes]
+        for i in range(len(self.nodes)):
+            for j in range(i + 1, len(self.nodes)):
+                if self._visible(self.nodes[i], self.nodes[j]):
+                    d = math.dist(self.nodes[i], self.nodes[j])
+                    self.edges[i].append((j, d))
+                    self.edges[j].append((i, d))
+
+    def _project(self, p: LatLng) -> tuple[float, float]:
+        return (p[1] - self.lng0) * self.kx, (p[0] - self.lat0) * METERS_PER_DEG
+
+    def _unproject(self, xy: tuple[float, float]) -> LatLng:
+        return self.lat0 + xy[1] / METERS_PER_DEG, self.lng0 + xy[0] / self.kx
+
+    def _inflated_vertices(self, margin_m: float) -> list[tuple[float, float]]:
+        nodes = []
+        for poly in self.polygons:
+            pts = poly.points
+            n = len(pts)
+            area = sum(pts[i - 1][0] * pts[i][1] - pts[i][0] * pts[i - 1][1] for i in range(n))
+            orientation = 1.0 if area > 0 else -1.0
+            for i in range(n):
+                px, py = pts[i - 1]
+                cx, cy = pts[i]
+                nx_, ny_ = pts[(i + 1) % n]
+                e1 = (cx - px, cy - py)
+                e2 = (nx_ - cx, ny_ - cy)
+                if _cross(px, py, cx, cy, nx_, ny_) * orientation < 0:
+                    continue
+                n1 = (e1[1] * orientation, -e1[0] * orientation)
+                n2 = (e2[1] * orientation, -e2[0] * orientation)
+                l1 = math.hypot(*n1) or 1.0
+                l2 = math.hypot(*n2) or 1.0
+                bx = n1[0] / l1 + n2[0] / l2
+                by = n1[1] / l1 + n2[1] / l2
+                lb = math.hypot(bx, by) or 1.0
+                node = (cx + bx / lb * margin_m * math.sqrt(2), cy + by / lb * margin_m * math.sqrt(2))
+                if not any(p.contains(*node) for p in self.polygons):
+                    nodes.append(node)
+        return nodes
+
+    def _visible(self, a: tuple[float, float], b: tuple[float, float]) -> bool:
+        return not any(poly.blocks(a, b) for poly in self.polygons)
+
+    def _key(self, start: LatLng, end: LatLng) -> tuple[int, int, int, int]:
+        q = self.quantum_deg
+        return round(start[0] / q), round(start[1] / q), round(end[0] / q), round(end[1] / q)
+
+    def plan(self, start: LatLng, end: LatLng) -> list[LatLng]:
+        if not self.polygons:
+            return [start, end]
+        a = self._project(start)
+        b = self._project(end)
+        if any(p.contains(*a) for p in self.polygons):
+            raise RouteInfeasibleError("Start point is inside a no-fly zone")
+        if any(p.contains(*b) for p in self.polygons):
+            raise RouteInfeasibleError("End point is inside a no-fly zone")
+
+        key = self._key(start, end)
+        with self._lock:
+            interior = self._cache.get(key)
+            if interior is not None:
+                self._cache.move_to_end(key)
+        if interior is not None:
+            first = self._project(interior[0]) if interior else b
+            last = self._project(interior[-1]) if interior else a
+            if self._visible(a, first) and self._visible(last, b):
+                self.hits += 1
+                return [start, *interior, end]
+
+        self.misses += 1
+        interior = [self._unproject(p) for p in self._search(a, b)]
+        with self._lock:
+            self._cache[key] = interior
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [start, *interior, end]
+
+    def _search(self, a: tuple[float, float], b: tuple[float, float]) -> list[tuple[float, float]]:
+        if self._visible(a, b):
+            return []
+        n = len(self.nodes)
+        start_id, goal_id = n, n + 1
+        start_edges = [(i, math.dist(a, p)) for i, p in enumerate(self.nodes) if self._visible(a, p)]
+        goal_links = {i: math.dist(p, b) for i, p in enumerate(self.nodes) if self._visible(p, b)}
+        if not start_edges or not goal_links:
+            raise RouteInfeasibleError("No route around no-fly zones")
+
+        best = {start_id: 0.0}
+        parent: dict[int, int] = {}
+        heap = [(math.dist(a, b), 0.0, start_id)]
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == goal_id:
+                break
+            if g > best.get(node, math.inf):
+                continue
+            neighbours = start_edges if node == start_id else self.edges[node]
+            extra = [(goal_id, goal_links[node])] if node in goal_links else []
+            for nxt, d in [*neighbours, *extra]:
+                cost = g + d
+                if cost < best.get(nxt, math.inf):
+                    best[nxt] = cost
+                    parent[nxt] = node
+                    h = 0.0 if nxt == goal_id else math.dist(self.nodes[nxt], b)
+                    heapq.heappush(heap, (cost + h, cost, nxt))
+        if goal_id not in parent:
+            raise RouteInfeasibleError("No route around no-fly zones")
+
+        path = []
+        node = parent[goal_id]
+        while node != start_id:
+            path.append(self.nodes[node])
+            node = parent[node]
+        path.reverse()
+        return path
@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp(prefix='order_api_tests_')) / 'order_api.db'}"
+os.environ["JWT_PRIVATE_KEY"] = _key.private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+).decode("utf-8")
+os.environ["JWT_PUBLIC_KEY"] = _key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode("utf-8")
+
+
+@pytest.fixture
+def main():
+    import main
+
+    with main.get_conn() as conn:
+        for table in ("deliveries", "outbox", "refresh_tokens", "sync_cursors"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute(
+            """
+            UPDATE drones SET state = 'IDLE', delivery_id = NULL, battery_pct = 100.0,
+              lat = home_lat, lng = home_lng, available_at = 0
+            """
+        )
+        conn.commit()
+    main._load_fleet()
+    with main._revoked_refresh_lock:
+        main._revoked_refresh_jtis.clear()
+    return main
+
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def auth(main):
+    def _auth(subject: str = "guest:test", role: str = "customer", scopes: tuple[str, ...] = ("deliveries:create",)) -> dict:
+        return {"Authorization": f"Bearer {main._issue_access_token(subject, role, list(scopes))}"}
+
+    return _auth
+
+
+@pytest.fixture
+def create_delivery(client, auth):
+    def _create(**overrides) -> str:
+        body = {"store_id": "s1", "start_lat": 43.2920278, "start_lng": 77.001, "end_lat": 43.30, "end_lng": 77.01, **overrides}
+        resp = client.post("/deliveries", json=body, headers=auth())
+        assert resp.status_code == 200, resp.text
+        return resp.json()["delivery_id"]
+
+    return _create
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+ITEM = {"store_id": "s1", "start_lat": 43.2920278, "start_lng": 77.001, "end_lat": 43.30, "end_lng": 77.01}
+
+
+def _count(main, table: str) -> int:
+    with main.get_conn() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_bulk_streams_one_ndjson_line_per_item(main, client, auth):
+    resp = client.post("/deliveries/bulk", json=[ITEM, {**ITEM, "product_ids": ["s1_p1"]}, ITEM], headers=auth())
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert len({line["delivery_id"] for line in lines}) == 3
+    assert _count(main, "deliveries") == 3
+    assert _count(main, "refresh_tokens") == 3
+    for line in lines:
+        claims = main._decode_token(line["tracking_refresh_token"])
+        assert (claims["type"], claims["sub"]) == ("refresh", line["delivery_id"])
+        refreshed = client.post("/auth/refresh", json={"refresh_token": line["tracking_refresh_token"]})
+        assert refreshed.status_code == 200
+
+
+def test_bulk_rejects_whole_batch_on_invalid_item(main, client, auth):
+    resp = client.post("/deliveries/bulk", json=[ITEM, {**ITEM, "product_ids": ["missing"]}], headers=auth())
+
+    assert resp.status_code == 422
+    assert _count(main, "deliveries") == 0
+    assert _count(main, "refresh_tokens") == 0
+
+
+def test_bulk_enforces_item_limit(main, client, auth, monkeypatch):
+    monkeypatch.setattr(main, "BULK_MAX_ITEMS", 2)
+
+    assert client.post("/deliveries/bulk", json=[ITEM] * 3, headers=auth()).status_code == 413
+    assert client.post("/deliveries/bulk", json=[], headers=auth()).status_code == 422
+
+
+def test_single_create_stores_refresh_token_in_same_transaction(main, client, auth, monkeypatch):
+    def _fail(cur, claims):
+        raise RuntimeError("refresh token insert failed")
+
+    monkeypatch.setattr(main, "_store_refresh_claims", _fail)
+
+    with pytest.raises(RuntimeError):
+        client.post("/deliveries", json=ITEM, headers=auth())
+    assert _count(main, "deliveries") == 0
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+from db import ConnectionPool, SQLiteBackend, create_backend
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(SQLiteBackend(tmp_path / "test.db"), max_size=2, acquire_timeout=0.1)
+    yield pool
+    pool.close()
+
+
+def test_pooled_connection_is_tuned(pool):
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_pool_respects_max_size_and_times_out(pool):
+    held = []
+    ready = threading.Barrier(3)
+    release = threading.Event()
+
+    def _hold():
+        with pool.connection() as conn:
+            held.append(conn)
+            ready.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=_hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert held[0] is not held[1]
+    with pool.connection() as conn:
+        assert conn in held
+
+
+def test_uncommitted_transaction_is_rolled_back_on_checkin(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items(x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO items VALUES (1)")
+        assert conn.in_transaction
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_nested_connection_reuses_outer(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+        outer.execute("SELECT 1")
+
+    assert len(pool._idle) == 1
+    with pool.connection() as first, pool.connection() as second:
+        assert first is second is outer
+
+
+def test_tasks_on_one_event_loop_get_separate_connections(pool):
+    async def _hold():
+        with pool.connection() as conn:
+            await asyncio.sleep(0.01)
+            with pool.connection() as nested:
+                assert nested is conn
+            return conn
+
+    async def _run():
+        return await asyncio.gather(_hold(), _hold())
+
+    first, second = asyncio.run(_run())
+
+    assert first is not second
+
+
+def test_timing_hook_sees_statements_and_commits(tmp_path):
+    calls = []
+    backend = create_backend(f"sqlite:///{tmp_path / 'timed.db'}", on_timing=lambda operation, seconds: calls.append(operation))
+    pool = ConnectionPool(backend, max_size=1)
+    with pool.connection() as conn:
+        conn.cursor().execute("CREATE TABLE items(x INTEGER)")
+        conn.cursor().executemany("INSERT INTO items VALUES (?)", [(1,), (2,)])
+        conn.commit()
+    pool.close()
+
+    assert {"execute", "executemany", "commit"} <= set(calls)
+
+
+def test_unsupported_database_url_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend("postgresql://localhost/orders")
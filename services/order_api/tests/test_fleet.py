@@ -0,0 +1,182 @@
+import pytest
+
+from fleet import BUSY, CHARGING, IDLE, DispatchRequest, Drone, FleetRegistry, path_length_m
+
+NOW = 1000.0
+PICKUP = (43.24, 76.90)
+DROPOFF = (43.25, 76.92)
+
+
+def _drone(drone_id: str, lat: float, lng: float, battery_pct: float = 100.0, capacity_g: float = 2000.0) -> Drone:
+    return Drone(drone_id, lat, lng, lat, lng, battery_pct, capacity_g)
+
+
+def _request(delivery_id: str = "d-1", pickup=PICKUP, dropoff=DROPOFF, weight_g: float = 500.0) -> DispatchRequest:
+    return DispatchRequest(delivery_id, pickup[0], pickup[1], dropoff[0], dropoff[1], weight_g)
+
+
+def _fleet(drones: list[Drone], route=None) -> FleetRegistry:
+    fleet = FleetRegistry(battery_pct_per_km=2.0, reserve_battery_pct=20.0, charge_pct_per_sec=1.0, route=route)
+    fleet.load(drones, NOW)
+    return fleet
+
+
+def test_assign_picks_nearest_idle_drone():
+    fleet = _fleet([_drone("far", 43.267, 76.90), _drone("near", 43.249, 76.90)])
+
+    [a] = fleet.assign([_request()], NOW)
+
+    assert a.drone_id == "near"
+    assert a.waypoints == [(43.249, 76.90), PICKUP, DROPOFF]
+    assert a.distance_m == pytest.approx(path_length_m(a.waypoints))
+    assert a.battery_used_pct == pytest.approx(a.distance_m / 1000 * 2.0)
+    drone = fleet.drones["near"]
+    assert drone.state == BUSY
+    assert drone.delivery_id == "d-1"
+    assert (drone.lat, drone.lng) == DROPOFF
+    assert drone.battery_pct == pytest.approx(100.0 - a.battery_used_pct)
+
+
+def test_assign_skips_drone_without_capacity():
+    fleet = _fleet([_drone("near", 43.249, 76.90, capacity_g=400.0), _drone("far", 43.267, 76.90)])
+
+    [a] = fleet.assign([_request(weight_g=1000.0)], NOW)
+
+    assert a.drone_id == "far"
+    assert fleet.drones["near"].state == IDLE
+
+
+def test_assign_returns_nothing_when_no_drone_can_carry_payload():
+    fleet = _fleet([_drone("near", 43.249, 76.90, capacity_g=400.0)])
+
+    assert fleet.assign([_request(weight_g=1000.0)], NOW) == []
+    assert not fleet.in_range(_request(weight_g=1000.0))
+
+
+def test_assign_keeps_battery_reserve():
+    fleet = _fleet([_drone("near", 43.249, 76.90, battery_pct=25.0), _drone("far", 43.267, 76.90)])
+
+    [a] = fleet.assign([_request()], NOW)
+
+    assert a.drone_id == "far"
+    assert fleet.drones["far"].battery_pct >= 20.0
+
+
+def test_assign_matches_window_without_double_booking():
+    fleet = _fleet([_drone("d1", 43.241, 76.90), _drone("d2", 43.25, 76.90)])
+    requests = [
+        _request("r1", pickup=(43.24, 76.90)),
+        _request("r2", pickup=(43.243, 76.90)),
+        _request("r3", pickup=(43.235, 76.90)),
+    ]
+
+    assignments = fleet.assign(requests, NOW)
+
+    assert {a.delivery_id: a.drone_id for a in assignments} == {"r1": "d1", "r2": "d2"}
+    assert fleet.assign([requests[2]], NOW) == []
+
+
+def test_assign_skips_drone_with_unroutable_approach():
+    blocked = (43.249, 76.90)
+
+    def route(start, end):
+        return None if start == blocked else [start, end]
+
+    fleet = _fleet([_drone("near", *blocked), _drone("far", 43.267, 76.90)], route=route)
+
+    [a] = fleet.assign([_request()], NOW)
+
+    assert a.drone_id == "far"
+    assert fleet.drones["near"].state == IDLE
+
+
+def test_assign_checks_battery_against_planned_path():
+    near = (43.249, 76.90)
+    detour = (43.249, 77.02)
+
+    def route(start, end):
+        return [start, detour, end] if start == near else [start, end]
+
+    fleet = _fleet([_drone("near", *near, battery_pct=40.0), _drone("far", 43.267, 76.90)], route=route)
+
+    [a] = fleet.assign([_request()], NOW)
+
+    assert a.drone_id == "far"
+
+
+def test_assign_uses_planned_waypoints():
+    corner = (43.245, 76.91)
+
+    def route(start, end):
+        return [start, corner, end] if start == PICKUP else [start, end]
+
+    fleet = _fleet([_drone("near", 43.249, 76.90)], route=route)
+
+    [a] = fleet.assign([_request()], NOW)
+
+    assert a.waypoints == [(43.249, 76.90), PICKUP, corner, DROPOFF]
+    assert a.distance_m == pytest.approx(path_length_m(a.waypoints))
+
+
+def test_release_only_frees_current_delivery():
+    fleet = _fleet([_drone("near", 43.249, 76.90)])
+    fleet.assign([_request("d-1")], NOW)
+
+    fleet.release("near", "d-other", NOW + 1)
+    assert fleet.drones["near"].state == BUSY
+
+    fleet.release("near", "d-1", NOW + 1)
+    drone = fleet.drones["near"]
+    assert drone.state == IDLE
+    assert drone.delivery_id is None
+
+
+def test_busy_drone_waits_for_release():
+    fleet = _fleet([_drone("near", 43.249, 76.90)])
+    fleet.assign([_request("d-1")], NOW)
+
+    fleet.refresh(NOW + 3600)
+    assert fleet.drones["near"].state == BUSY
+    assert fleet.assign([_request("d-2")], NOW + 3600) == []
+
+    fleet.release("near", "d-1", NOW + 3600)
+    assert fleet.assign([_request("d-2")], NOW + 3600)[0].drone_id == "near"
+
+
+def test_release_sends_low_battery_drone_home_to_charge():
+    fleet = _fleet([_drone("near", 43.249, 76.90, battery_pct=41.0)])
+    fleet.assign([_request("d-1")], NOW)
+    battery_pct = fleet.drones["near"].battery_pct
+
+    fleet.release("near", "d-1", NOW + 5)
+
+    drone = fleet.drones["near"]
+    assert drone.state == CHARGING
+    assert drone.delivery_id is None
+    assert (drone.lat, drone.lng) == (43.249, 76.90)
+    assert drone.available_at == pytest.approx(NOW + 5 + (100.0 - battery_pct))
+    fleet.refresh(drone.available_at)
+    assert drone.state == IDLE
+    assert drone.battery_pct == 100.0
+
+
+def test_revert_restores_drone():
+    fleet = _fleet([_drone("near", 43.249, 76.90)])
+    [a] = fleet.assign([_request()], NOW)
+    fleet.take_dirty()
+
+    fleet.revert(a, NOW)
+
+    drone = fleet.drones["near"]
+    assert drone.state == IDLE
+    assert drone.battery_pct == pytest.approx(100.0)
+    assert (drone.lat, drone.lng) == (43.249, 76.90)
+    assert [row[-1] for row in fleet.take_dirty()] == ["near"]
+    assert fleet.assign([_request("d-2")], NOW)[0].drone_id == "near"
+
+
+def test_in_range_uses_home_bases():
+    fleet = _fleet([_drone("near", 43.249, 76.90)])
+
+    assert fleet.in_range(_request())
+    assert not fleet.in_range(_request(dropoff=(43.45, 76.90)))
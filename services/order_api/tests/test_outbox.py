@@ -0,0 +1,111 @@
+import logging
+import threading
+
+
+def _outbox(main) -> dict:
+    with main.get_conn() as conn:
+        rows = conn.execute("SELECT delivery_id, kind, status, attempts FROM outbox ORDER BY id").fetchall()
+    return {(r["kind"], r["delivery_id"]): (r["status"], r["attempts"]) for r in rows}
+
+
+def _delivery(main, delivery_id: str):
+    with main.get_conn() as conn:
+        return conn.execute("SELECT status, drone_id FROM deliveries WHERE delivery_id = ?", (delivery_id,)).fetchone()
+
+
+def _drone(main, drone_id: str):
+    with main.get_conn() as conn:
+        return conn.execute("SELECT state, delivery_id FROM drones WHERE id = ?", (drone_id,)).fetchone()
+
+
+def test_outbox_results_are_applied_per_item(main, create_delivery):
+    started, duplicate, invalid, missing = [create_delivery() for _ in range(4)]
+    assert main._dispatch_pending_deliveries() == 4
+    rows = main._claim_outbox_batch()
+
+    sent = main._apply_outbox_results(
+        rows,
+        [
+            {"status": "started", "delivery_id": started},
+            {"status": "duplicate", "delivery_id": duplicate},
+            {"status": "invalid", "delivery_id": invalid, "error": "bad waypoints"},
+        ],
+    )
+
+    assert sorted(r["delivery_id"] for r in sent) == sorted([started, duplicate])
+    assert _outbox(main) == {
+        ("start", started): ("SENT", 0),
+        ("start", duplicate): ("SENT", 0),
+        ("start", invalid): ("FAILED", 1),
+        ("start", missing): ("PENDING", 1),
+    }
+    assert _delivery(main, started)["status"] == "ASSIGNED"
+    assert _delivery(main, missing)["status"] == "ASSIGNED"
+    failed = _delivery(main, invalid)
+    assert failed["status"] == "DISPATCH_FAILED"
+    assert main._fleet.drones[failed["drone_id"]].state == "IDLE"
+
+
+def test_exhausted_start_fails_delivery_and_frees_drone(main, create_delivery, client, auth, monkeypatch):
+    def _simulator_down(*args, **kwargs):
+        raise OSError("simulator down")
+
+    monkeypatch.setattr(main, "OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(main, "_post_simulator", _simulator_down)
+    delivery_id = create_delivery()
+    main._dispatch_pending_deliveries()
+    drone_id = _delivery(main, delivery_id)["drone_id"]
+
+    assert main._drain_outbox() == 1
+    assert _outbox(main)[("start", delivery_id)] == ("PENDING", 1)
+    assert _delivery(main, delivery_id)["status"] == "ASSIGNED"
+    assert main._fleet.drones[drone_id].state == "BUSY"
+
+    with main.get_conn() as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0")
+        conn.commit()
+    assert main._drain_outbox() == 1
+
+    assert _outbox(main)[("start", delivery_id)] == ("FAILED", 2)
+    assert _delivery(main, delivery_id)["status"] == "DISPATCH_FAILED"
+    assert main._fleet.drones[drone_id].state == "IDLE"
+    assert tuple(_drone(main, drone_id)) == ("IDLE", None)
+
+    resp = client.post(f"/deliveries/{delivery_id}/cancel", headers=auth(delivery_id, scopes=("deliveries:cancel",)))
+    assert resp.status_code == 409
+
+
+def test_sent_and_skipped_rows_are_purged_after_retention(main, create_delivery, monkeypatch):
+    delivery_id = create_delivery()
+    main._dispatch_pending_deliveries()
+    main._mark_outbox_sent(main._claim_outbox_batch())
+    monkeypatch.setattr(main, "OUTBOX_RETENTION_SECONDS", 3600)
+
+    assert main._purge_outbox() == 0
+    with main.get_conn() as conn:
+        conn.execute("UPDATE outbox SET created_at = created_at - 7200")
+        conn.commit()
+    assert main._purge_outbox() == 1
+    assert ("start", delivery_id) not in _outbox(main)
+
+
+def test_batched_delete_honours_its_own_stop_event(main, create_delivery):
+    for _ in range(3):
+        create_delivery()
+    main._dispatch_pending_deliveries()
+    main._mark_outbox_sent(main._claim_outbox_batch())
+    stop = threading.Event()
+    stop.set()
+
+    assert main._delete_in_batches("outbox", "status = 'SENT'", (), 1, stop) == 1
+    assert main._delete_in_batches("outbox", "status = 'SENT'", (), 1, threading.Event()) == 2
+
+
+def test_background_failure_logs_first_error_and_backs_off(main, caplog):
+    with caplog.at_level(logging.WARNING, logger="order_api"):
+        first = main._background_failure("outbox", 1, OSError("simulator down"), 1.0)
+        later = main._background_failure("outbox", 10, OSError("simulator down"), 1.0)
+
+    assert first == 2.0
+    assert later == main.BACKGROUND_BACKOFF_MAX_SECONDS
+    assert [r.getMessage() for r in caplog.records] == ["Background loop outbox error: simulator down"]
@@ -0,0 +1,74 @@
+import time
+
+
+def _tokens(client, auth, body=None) -> dict:
+    resp = client.post(
+        "/deliveries",
+        json=body or {"store_id": "s1", "start_lat": 43.2920278, "start_lng": 77.001, "end_lat": 43.30, "end_lng": 77.01},
+        headers=auth(),
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def _refresh(client, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_cancel_revokes_refresh_tokens(main, client, auth):
+    created = _tokens(client, auth)
+    delivery_id = created["delivery_id"]
+    assert _refresh(client, created["tracking_refresh_token"]).status_code == 200
+
+    cancelled = client.post(f"/deliveries/{delivery_id}/cancel", headers={"Authorization": f"Bearer {created['tracking_access_token']}"})
+    assert cancelled.status_code == 200
+
+    resp = _refresh(client, created["tracking_refresh_token"])
+    assert resp.status_code == 401
+    assert resp.json()["detail"] == "Refresh token revoked"
+    with main.get_conn() as conn:
+        row = conn.execute("SELECT revoked, revoked_at FROM refresh_tokens WHERE delivery_id = ?", (delivery_id,)).fetchone()
+    assert row["revoked"] == 1
+    assert row["revoked_at"] is not None
+
+
+def test_refresh_does_not_read_database(main, client, auth, monkeypatch):
+    created = _tokens(client, auth)
+
+    def _no_db():
+        raise AssertionError("refresh must not touch the database")
+
+    monkeypatch.setattr(main, "get_conn", _no_db)
+    assert _refresh(client, created["tracking_refresh_token"]).status_code == 200
+
+
+def test_revocations_from_other_processes_are_synced(main, client, auth):
+    created = _tokens(client, auth)
+    main._load_revoked_refresh_tokens()
+    with main.get_conn() as conn:
+        conn.execute(
+            "UPDATE refresh_tokens SET revoked = 1, revoked_at = ? WHERE delivery_id = ?",
+            (time.time(), created["delivery_id"]),
+        )
+        conn.commit()
+    assert _refresh(client, created["tracking_refresh_token"]).status_code == 200
+
+    assert main._sync_revoked_refresh_tokens() == 1
+    assert _refresh(client, created["tracking_refresh_token"]).status_code == 401
+
+
+def test_expired_tokens_are_purged_from_table_and_revoked_set(main):
+    now = time.time()
+    with main.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO refresh_tokens (jti, delivery_id, expires_at, revoked) VALUES (?, ?, ?, ?)",
+            [("expired", "DLV-old", now - 10, 1), ("live", "DLV-new", now + 3600, 0)],
+        )
+        conn.commit()
+    with main._revoked_refresh_lock:
+        main._revoked_refresh_jtis["expired"] = now - 10
+
+    assert main._purge_expired_refresh_tokens() == 1
+    assert not main._is_refresh_revoked("expired")
+    with main.get_conn() as conn:
+        assert [r["jti"] for r in conn.execute("SELECT jti FROM refresh_tokens").fetchall()] == ["live"]
@@ -0,0 +1,88 @@
+import pytest
+
+from fleet import path_length_m
+from routing import RouteInfeasibleError, RoutePlanner
+
+ZONE = [(43.30, 77.00), (43.30, 77.01), (43.31, 77.01), (43.31, 77.00)]
+WEST = (43.307, 76.995)
+EAST = (43.307, 77.02)
+
+
+def _clear(planner: RoutePlanner, path) -> bool:
+    points = [planner._project(p) for p in path]
+    return all(planner._visible(a, b) for a, b in zip(points, points[1:]))
+
+
+def test_plan_without_zones_is_straight():
+    planner = RoutePlanner([])
+
+    assert planner.plan(WEST, EAST) == [WEST, EAST]
+
+
+def test_plan_keeps_straight_line_when_clear():
+    planner = RoutePlanner([ZONE])
+    start, end = (43.29, 76.99), (43.29, 77.02)
+
+    assert planner.plan(start, end) == [start, end]
+
+
+def test_plan_detours_around_zone():
+    planner = RoutePlanner([ZONE])
+
+    path = planner.plan(WEST, EAST)
+
+    assert path[0] == WEST and path[-1] == EAST
+    assert len(path) > 2
+    assert _clear(planner, path)
+    assert not _clear(planner, [WEST, EAST])
+    assert path_length_m(path) > path_length_m([WEST, EAST])
+    assert all(lat > 43.31 for lat, _ in path[1:-1])
+
+
+@pytest.mark.parametrize("start, end", [((43.305, 77.005), EAST), (WEST, (43.305, 77.005))])
+def test_plan_rejects_endpoints_inside_zone(start, end):
+    planner = RoutePlanner([ZONE])
+
+    with pytest.raises(RouteInfeasibleError):
+        planner.plan(start, end)
+
+
+def test_plan_rejects_enclosed_end():
+    walls = [
+        [(43.40, 77.00), (43.40, 77.10), (43.41, 77.10), (43.41, 77.00)],
+        [(43.49, 77.00), (43.49, 77.10), (43.50, 77.10), (43.50, 77.00)],
+        [(43.40, 77.00), (43.40, 77.01), (43.50, 77.01), (43.50, 77.00)],
+        [(43.40, 77.09), (43.40, 77.10), (43.50, 77.10), (43.50, 77.09)],
+    ]
+    planner = RoutePlanner(walls)
+
+    with pytest.raises(RouteInfeasibleError):
+        planner.plan((43.30, 76.90), (43.45, 77.05))
+
+
+def test_plan_reuses_cached_route():
+    planner = RoutePlanner([ZONE])
+
+    first = planner.plan(WEST, EAST)
+    nearby = (WEST[0] + 0.0001, WEST[1])
+    second = planner.plan(nearby, EAST)
+
+    assert planner.misses == 1
+    assert planner.hits == 1
+    assert second[1:-1] == first[1:-1]
+    assert second[0] == nearby
+    assert _clear(planner, second)
+
+
+def test_plan_rechecks_legs_on_cache_hit():
+    planner = RoutePlanner([ZONE], quantum_deg=0.02)
+    south = (43.296, 77.005)
+    assert planner._key(south, EAST) == planner._key(WEST, EAST)
+
+    planner.plan(WEST, EAST)
+    path = planner.plan(south, EAST)
+
+    assert planner.hits == 0
+    assert planner.misses == 2
+    assert path == [south, EAST]
+    assert _clear(planner, path)
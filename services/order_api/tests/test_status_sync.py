@@ -0,0 +1,86 @@
+import time
+
+
+def _transition(delivery_id: str, status: str, timestamp_utc: float | None = None) -> dict:
+    return {"delivery_id": delivery_id, "status": status, "timestamp_utc": timestamp_utc or time.time()}
+
+
+def _assigned_drone(main, delivery_id: str) -> str:
+    with main.get_conn() as conn:
+        return conn.execute("SELECT drone_id FROM deliveries WHERE delivery_id = ?", (delivery_id,)).fetchone()["drone_id"]
+
+
+def _drone_row(main, drone_id: str):
+    with main.get_conn() as conn:
+        return conn.execute("SELECT state, delivery_id FROM drones WHERE id = ?", (drone_id,)).fetchone()
+
+
+def test_drone_stays_busy_until_delivered(main, create_delivery):
+    delivery_id = create_delivery()
+    main._dispatch_pending_deliveries()
+    drone_id = _assigned_drone(main, delivery_id)
+
+    main._fleet.refresh(time.time() + main.FLEET_FLIGHT_SECONDS * 100)
+    main._apply_status_transitions([_transition(delivery_id, "IN_FLIGHT")], 1)
+    assert main._fleet.drones[drone_id].state == "BUSY"
+    assert _drone_row(main, drone_id)["state"] == "BUSY"
+
+    main._apply_status_transitions([_transition(delivery_id, "DELIVERED")], 2)
+
+    drone = main._fleet.drones[drone_id]
+    assert drone.state in ("IDLE", "CHARGING")
+    assert drone.delivery_id is None
+    row = _drone_row(main, drone_id)
+    assert row["state"] == drone.state
+    assert row["delivery_id"] is None
+
+
+
+def _status(main, delivery_id: str):
+    with main.get_conn() as conn:
+        return conn.execute("SELECT status, status_updated_at FROM deliveries WHERE delivery_id = ?", (delivery_id,)).fetchone()
+
+
+def test_latest_transition_per_delivery_is_applied(main, create_delivery):
+    first, second = create_delivery(), create_delivery()
+
+    main._apply_status_transitions(
+        [
+            _transition(first, "ASSIGNED", 10.0),
+            _transition(second, "IN_FLIGHT", 11.0),
+            _transition(first, "IN_FLIGHT", 12.0),
+        ],
+        42,
+    )
+
+    assert tuple(_status(main, first)) == ("IN_FLIGHT", 12.0)
+    assert tuple(_status(main, second)) == ("IN_FLIGHT", 11.0)
+    assert main._load_sync_cursor("tracking_status") == 42
+
+
+def test_terminal_delivery_ignores_later_transitions(main, create_delivery, client):
+    delivery_id = create_delivery()
+    token = main._issue_access_token(delivery_id, "customer", ["deliveries:cancel"])
+    assert client.post(f"/deliveries/{delivery_id}/cancel", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    main._apply_status_transitions([_transition(delivery_id, "DELIVERED")], 7)
+
+    assert _status(main, delivery_id)["status"] == "CANCELLED"
+    assert main._load_sync_cursor("tracking_status") == 7
+
+
+def test_sync_pulls_from_the_cursor(main, create_delivery, monkeypatch):
+    delivery_id = create_delivery()
+    calls = []
+
+    def _feed(path, params):
+        calls.append((path, params))
+        return {"transitions": [_transition(delivery_id, "IN_FLIGHT")], "next_after": params["after"] + 5}
+
+    monkeypatch.setattr(main, "_get_tracking", _feed)
+    main._apply_status_transitions([], 3)
+
+    assert main._sync_delivery_statuses() == 1
+    assert calls == [("/status-transitions", {"after": 3, "limit": main.STATUS_SYNC_BATCH_SIZE})]
+    assert main._load_sync_cursor("tracking_status") == 8
+    assert _status(main, delivery_id)["status"] == "IN_FLIGHT"
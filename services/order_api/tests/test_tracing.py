@@ -0,0 +1,42 @@
+from tracing import TraceStore
+
+
+def _ops(auth) -> dict:
+    return auth("ops", role="operator", scopes=())
+
+
+def test_trace_follows_delivery_from_creation_to_simulator(main, client, auth, create_delivery, monkeypatch):
+    posted = []
+
+    def _simulator(path: str, body: dict, scopes: list[str]) -> dict:
+        posted.append(body)
+        return {"results": [{"status": "started", "delivery_id": f["delivery_id"]} for f in body["flights"]]}
+
+    monkeypatch.setattr(main, "_post_simulator", _simulator)
+    delivery_id = create_delivery()
+    main._dispatch_pending_deliveries()
+    main._drain_outbox()
+
+    resp = client.get(f"/traces/{delivery_id}", headers=_ops(auth))
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [hop["name"] for hop in body["hops"]] == ["order.created", "fleet.assigned", "simulator.dispatched"]
+    assert body["hops"][0]["since_previous_ms"] is None
+    assert body["total_ms"] >= 0
+    [flight] = posted[0]["flights"]
+    assert flight["trace_id"] == body["trace_id"]
+    with main.get_conn() as conn:
+        stored = conn.execute("SELECT trace_id FROM deliveries WHERE delivery_id = ?", (delivery_id,)).fetchone()
+    assert stored["trace_id"] == body["trace_id"]
+
+
+def test_trace_falls_back_to_stored_creation(main, client, auth, create_delivery, monkeypatch):
+    delivery_id = create_delivery()
+    monkeypatch.setattr(main, "_traces", TraceStore())
+
+    resp = client.get(f"/traces/{delivery_id}", headers=_ops(auth))
+
+    assert resp.status_code == 200
+    assert [hop["name"] for hop in resp.json()["hops"]] == ["order.created"]
+    assert client.get("/traces/unknown", headers=_ops(auth)).status_code == 404
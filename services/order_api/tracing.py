@@ -0,0 +1,34 @@
+import json
+import threading
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class TraceStore:
+    def __init__(self, max_deliveries: int = 10000, max_spans_per_delivery: int = 256, log_path: str | None = None) -> None:
+        self.max_deliveries = max_deliveries
+        self.max_spans_per_delivery = max_spans_per_delivery
+        self._spans: OrderedDict[str, deque] = OrderedDict()
+        self._lock = threading.Lock()
+        self._log = Path(log_path).open("a", encoding="utf-8", buffering=1) if log_path else None
+
+    def record(self, delivery_id: str, trace_id: str | None, name: str, **fields) -> None:
+        span = {"delivery_id": delivery_id, "trace_id": trace_id, "name": name, **fields}
+        with self._lock:
+            spans = self._spans.get(delivery_id)
+            if spans is None:
+                spans = self._spans[delivery_id] = deque(maxlen=self.max_spans_per_delivery)
+                if len(self._spans) > self.max_deliveries:
+                    self._spans.popitem(last=False)
+            spans.append(span)
+            if self._log:
+                self._log.write(json.dumps(span) + "\n")
+
+    def get(self, delivery_id: str) -> list[dict]:
+        with self._lock:
+            return list(self._spans.get(delivery_id, ()))
@@ -0,0 +1,91 @@
+import math
+
+EARTH_RADIUS_M = 6371000.0
+TERMINAL_STATUSES = {"DELIVERED", "CANCELLED"}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class EtaEstimate:
+    __slots__ = ("lat", "lng", "timestamp_utc", "start_progress", "remaining_m", "speed_mps", "travelled_m", "eta_utc")
+
+    def __init__(self, lat: float, lng: float, timestamp_utc: float, start_progress: float, remaining_m: float | None) -> None:
+        self.lat = lat
+        self.lng = lng
+        self.timestamp_utc = timestamp_utc
+        self.start_progress = start_progress
+        self.remaining_m = remaining_m
+        self.speed_mps = 0.0
+        self.travelled_m = 0.0
+        self.eta_utc: float | None = None
+
+    def copy(self) -> "EtaEstimate":
+        est = EtaEstimate(self.lat, self.lng, self.timestamp_utc, self.start_progress, self.remaining_m)
+        est.speed_mps = self.speed_mps
+        est.travelled_m = self.travelled_m
+        est.eta_utc = self.eta_utc
+        return est
+
+
+class EtaTracker:
+    def __init__(self, alpha: float = 0.3, max_entries: int = 100000) -> None:
+        self.alpha = alpha
+        self.max_entries = max_entries
+        self._estimates: dict[str, EtaEstimate] = {}
+
+    def estimate(
+        self,
+        delivery_id: str,
+        lat: float,
+        lng: float,
+        progress: float,
+        status: str,
+        timestamp_utc: float,
+        remaining_m: float | None = None,
+    ) -> tuple[float | None, EtaEstimate | None]:
+        if status in TERMINAL_STATUSES:
+            return (timestamp_utc if status == "DELIVERED" else None), None
+
+        prev = self._estimates.get(delivery_id)
+        if prev is None:
+            return None, EtaEstimate(lat, lng, timestamp_utc, progress, remaining_m)
+
+        dt = timestamp_utc - prev.timestamp_utc
+        if dt <= 0:
+            return prev.eta_utc, prev
+        est = prev.copy()
+        step_m = haversine_m(est.lat, est.lng, lat, lng)
+        if remaining_m is not None and est.remaining_m is not None:
+            step_m = max(step_m, est.remaining_m - remaining_m)
+        speed = step_m / dt
+        est.speed_mps = speed if est.speed_mps <= 0 else self.alpha * speed + (1 - self.alpha) * est.speed_mps
+        est.travelled_m += step_m
+        est.lat, est.lng, est.timestamp_utc = lat, lng, timestamp_utc
+        est.remaining_m = remaining_m
+
+        covered = progress - est.start_progress
+        if remaining_m is None and covered > 0 and progress < 1:
+            remaining_m = est.travelled_m / covered * (1 - progress)
+        if remaining_m is None or est.speed_mps <= 0:
+            return est.eta_utc, est
+        est.eta_utc = timestamp_utc + remaining_m / est.speed_mps
+        return est.eta_utc, est
+
+    def commit(self, delivery_id: str, estimate: EtaEstimate | None) -> None:
+        if estimate is None:
+            self._estimates.pop(delivery_id, None)
+            return
+        if delivery_id not in self._estimates and len(self._estimates) >= self.max_entries:
+            self._estimates.pop(next(iter(self._estimates)))
+        self._estimates[delivery_id] = estimate
+
+    def get(self, delivery_id: str) -> float | None:
+        est = self._estimates.get(delivery_id)
+        return est.eta_utc if est else None
@@ -0,0 +1,200 @@
+import json
+import math
+from pathlib import Path
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG = math.radians(1) * EARTH_RADIUS_M
+
+ENTER = "enter"
+EXIT = "exit"
+RESTRICTED = "restricted"
+PICKUP = "pickup"
+CUSTOMER = "customer"
+
+
+class Fence:
+    __slots__ = ("id", "kind", "min_lat", "min_lng", "max_lat", "max_lng", "points", "center", "kx", "radius_sq")
+
+    def __init__(self, fence_id: str, kind: str) -> None:
+        self.id = fence_id
+        self.kind = kind
+        self.points: list[tuple[float, float]] = []
+        self.center: tuple[float, float] | None = None
+        self.kx = 0.0
+        self.radius_sq = 0.0
+
+    @classmethod
+    def circle(cls, fence_id: str, kind: str, lat: float, lng: float, radius_m: float) -> "Fence":
+        fence = cls(fence_id, kind)
+        fence.center = (lat, lng)
+        fence.kx = METERS_PER_DEG * math.cos(math.radians(lat))
+        fence.radius_sq = radius_m * radius_m
+        dlat = radius_m / METERS_PER_DEG
+        dlng = radius_m / fence.kx
+        fence.min_lat, fence.max_lat = lat - dlat, lat + dlat
+        fence.min_lng, fence.max_lng = lng - dlng, lng + dlng
+        return fence
+
+    @classmethod
+    def polygon(cls, fence_id: str, kind: str, points: list[tuple[float, float]]) -> "Fence":
+        fence = cls(fence_id, kind)
+        fence.points = points
+        fence.min_lat = min(p[0] for p in points)
+        fence.max_lat = max(p[0] for p in points)
+        fence.min_lng = min(p[1] for p in points)
+        fence.max_lng = max(p[1] for p in points)
+        return fence
+
+    def contains(self, lat: float, lng: float) -> bool:
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return False
+        if self.center is not None:
+            dx = (lng - self.center[1]) * self.kx
+            dy = (lat - self.center[0]) * METERS_PER_DEG
+            return dx * dx + dy * dy <= self.radius_sq
+        inside = False
+        pts = self.points
+        j = len(pts) - 1
+        for i in range(len(pts)):
+            yi, xi = pts[i]
+            yj, xj = pts[j]
+            if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+
+def load_geofences(path: Path | str | None) -> list[Fence]:
+    if not path or not Path(path).exists():
+        return []
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    fences: list[Fence] = []
+    for n, feature in enumerate(data.get("features", [])):
+        props = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        fence_id = str(props.get("id") or f"fence-{n + 1}")
+        kind = props.get("kind", RESTRICTED)
+        if geometry.get("type") == "Point" and props.get("radius_m"):
+            lng, lat = geometry["coordinates"][:2]
+            fences.append(Fence.circle(fence_id, kind, float(lat), float(lng), float(props["radius_m"])))
+            continue
+        if geometry.get("type") == "Polygon":
+            rings = [geometry["coordinates"][0]]
+        elif geometry.get("type") == "MultiPolygon":
+            rings = [poly[0] for poly in geometry["coordinates"]]
+        else:
+            continue
+        for k, ring in enumerate(rings):
+            points = [(float(lat), float(lng)) for lng, lat in ring]
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+            if len(points) >= 3:
+                fences.append(Fence.polygon(fence_id if len(rings) == 1 else f"{fence_id}-{k + 1}", kind, points))
+    return fences
+
+
+class GeofenceIndex:
+    def __init__(self, cell_deg: float = 0.01) -> None:
+        self.cell_deg = cell_deg
+        self.fences: dict[str, Fence] = {}
+        self._cells: dict[tuple[int, int], list[Fence]] = {}
+
+    def _cell_range(self, fence: Fence):
+        i0 = math.floor(fence.min_lat / self.cell_deg)
+        i1 = math.floor(fence.max_lat / self.cell_deg)
+        j0 = math.floor(fence.min_lng / self.cell_deg)
+        j1 = math.floor(fence.max_lng / self.cell_deg)
+        return ((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+
+    def add(self, fence: Fence) -> None:
+        self.remove(fence.id)
+        self.fences[fence.id] = fence
+        for cell in self._cell_range(fence):
+            self._cells.setdefault(cell, []).append(fence)
+
+    def remove(self, fence_id: str) -> Fence | None:
+        fence = self.fences.pop(fence_id, None)
+        if fence is None:
+            return None
+        for cell in self._cell_range(fence):
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket[:] = [f for f in bucket if f is not fence]
+                if not bucket:
+                    del self._cells[cell]
+        return fence
+
+    def __len__(self) -> int:
+        return len(self.fences)
+
+    def candidates(self, lat: float, lng: float) -> list[Fence]:
+        return self._cells.get((math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)), [])
+
+
+class GeofenceEngine:
+    def __init__(
+        self,
+        index: GeofenceIndex,
+        pickup_radius_m: float = 50.0,
+        customer_radius_m: float = 200.0,
+        max_entries: int = 100000,
+    ) -> None:
+        self.index = index
+        self.pickup_radius_m = pickup_radius_m
+        self.customer_radius_m = customer_radius_m
+        self.max_entries = max_entries
+        self._scoped: dict[str, tuple[Fence, ...]] = {}
+        self._inside: dict[str, frozenset[Fence]] = {}
+
+    def has_delivery_fences(self, delivery_id: str) -> bool:
+        return delivery_id in self._scoped
+
+    def set_delivery_fences(
+        self,
+        delivery_id: str,
+        pickup: tuple[float, float] | None,
+        dropoff: tuple[float, float] | None,
+    ) -> None:
+        fences = []
+        if pickup is not None:
+            fences.append(Fence.circle(f"{PICKUP}:{delivery_id}", PICKUP, pickup[0], pickup[1], self.pickup_radius_m))
+        if dropoff is not None:
+            fences.append(Fence.circle(f"{CUSTOMER}:{delivery_id}", CUSTOMER, dropoff[0], dropoff[1], self.customer_radius_m))
+        if delivery_id not in self._scoped and len(self._scoped) >= self.max_entries:
+            evicted = next(iter(self._scoped))
+            self._scoped.pop(evicted)
+            self._inside.pop(evicted, None)
+        self._scoped[delivery_id] = tuple(fences)
+
+    def check(self, delivery_id: str, lat: float, lng: float) -> tuple[list[tuple[str, Fence]], frozenset[Fence]]:
+        inside = [f for f in self.index.candidates(lat, lng) if f.contains(lat, lng)]
+        for fence in self._scoped.get(delivery_id, ()):
+            if fence.contains(lat, lng):
+                inside.append(fence)
+        previous = self._inside.get(delivery_id)
+        if not inside and not previous:
+            return [], frozenset()
+
+        current = frozenset(inside)
+        if previous is None:
+            previous = frozenset()
+        events = [(ENTER, f) for f in inside if f not in previous]
+        events.extend((EXIT, f) for f in previous if f not in current)
+        return events, current
+
+    def commit(self, delivery_id: str, current: frozenset[Fence]) -> None:
+        if not current:
+            self._inside.pop(delivery_id, None)
+            return
+        if delivery_id not in self._inside and len(self._inside) >= self.max_entries:
+            self._inside.pop(next(iter(self._inside)))
+        self._inside[delivery_id] = current
+
+    def evaluate(self, delivery_id: str, lat: float, lng: float) -> list[tuple[str, Fence]]:
+        events, current = self.check(delivery_id, lat, lng)
+        self.commit(delivery_id, current)
+        return events
+
+    def forget(self, delivery_id: str) -> None:
+        self._scoped.pop(delivery_id, None)
+        self._inside.pop(delivery_id, None)
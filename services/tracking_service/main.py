@@ -1,23 +1,79 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, WebSocket, WebSocketException
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response, WebSocket, WebSocketException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import sqlite3
 import time
-from typing import Optional
+from typing import AsyncIterator, ContextManager, Optional
 from pathlib import Path
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import json
+import logging
 import os
 import asyncio
 import jwt
+from cryptography.hazmat.primitives import serialization
+from db import ConnectionPool, create_backend
+from eta import TERMINAL_STATUSES, EtaTracker
+from geofence import Fence, GeofenceEngine, GeofenceIndex, load_geofences
+from metrics import Registry, RequestMetricsMiddleware
+from replay import ReplayBuffer
+from sequencing import DUPLICATE, IN_ORDER, SequenceTracker
+from shaping import RateShaper, TimerWheel
+from tracing import TraceStore
 
 DB_PATH = Path(__file__).parent / "tracking.db"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
 JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
 JWT_PUBLIC_KEY_PATH = os.getenv("JWT_PUBLIC_KEY_PATH")
 JWT_ISSUER = os.getenv("JWT_ISSUER", "droneapp")
 JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "droneapp-clients")
 CORS_ALLOW_ORIGINS = os.getenv("CORS_ALLOW_ORIGINS", "*")
+ETA_SPEED_ALPHA = float(os.getenv("ETA_SPEED_ALPHA", "0.3"))
+ETA_MAX_IDS = int(os.getenv("ETA_MAX_IDS", "500"))
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "100000"))
+STATUS_TRANSITIONS_MAX_BATCH = int(os.getenv("STATUS_TRANSITIONS_MAX_BATCH", "5000"))
+SEQUENCE_WINDOW = int(os.getenv("SEQUENCE_WINDOW", "64"))
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "64"))
+REPLAY_MAX_DELIVERIES = int(os.getenv("REPLAY_MAX_DELIVERIES", "5000"))
+REPLAY_DB_MAX_EVENTS = int(os.getenv("REPLAY_DB_MAX_EVENTS", "1000"))
+LONGPOLL_MAX_TIMEOUT_SECONDS = float(os.getenv("LONGPOLL_MAX_TIMEOUT_SECONDS", "30"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_MAX_PENDING = int(os.getenv("SSE_MAX_PENDING", "4096"))
+SHAPING_TICK_SECONDS = float(os.getenv("SHAPING_TICK_SECONDS", "0.05"))
+BACKGROUND_BACKOFF_MAX_SECONDS = float(os.getenv("BACKGROUND_BACKOFF_MAX_SECONDS", "30"))
+STATUS_TRANSITIONS_RETENTION_SECONDS = float(os.getenv("STATUS_TRANSITIONS_RETENTION_SECONDS", "604800"))
+GEOFENCE_EVENTS_RETENTION_SECONDS = float(os.getenv("GEOFENCE_EVENTS_RETENTION_SECONDS", "604800"))
+RETENTION_PURGE_INTERVAL_SECONDS = float(os.getenv("RETENTION_PURGE_INTERVAL_SECONDS", "300"))
+RETENTION_PURGE_BATCH_SIZE = int(os.getenv("RETENTION_PURGE_BATCH_SIZE", "1000"))
+GEOFENCES_PATH = os.getenv("GEOFENCES_PATH", str(Path(__file__).parent / "geofences.json"))
+GEOFENCE_CELL_DEG = float(os.getenv("GEOFENCE_CELL_DEG", "0.01"))
+GEOFENCE_PICKUP_RADIUS_M = float(os.getenv("GEOFENCE_PICKUP_RADIUS_M", "50"))
+GEOFENCE_CUSTOMER_RADIUS_M = float(os.getenv("GEOFENCE_CUSTOMER_RADIUS_M", "200"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+TRACE_MAX_DELIVERIES = int(os.getenv("TRACE_MAX_DELIVERIES", "10000"))
+TRACE_MAX_SPANS_PER_DELIVERY = int(os.getenv("TRACE_MAX_SPANS_PER_DELIVERY", "256"))
 
-app = FastAPI(title="Tracking Service")
+logger = logging.getLogger("tracking_service")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    shaping_task = asyncio.create_task(_shaping_loop())
+    retention_task = asyncio.create_task(_retention_loop())
+    try:
+        yield
+    finally:
+        shaping_task.cancel()
+        retention_task.cancel()
+
+
+app = FastAPI(title="Tracking Service", lifespan=lifespan)
 
 allow_origins = [o.strip() for o in CORS_ALLOW_ORIGINS.split(",") if o.strip()]
 app.add_middleware(
@@ -29,6 +85,33 @@ app.add_middleware(
 )
 
 
+metrics_registry = Registry()
+http_request_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+jwt_seconds = metrics_registry.histogram("jwt_duration_seconds", "JWT verify latency", ("operation",))
+sqlite_seconds = metrics_registry.histogram("sqlite_duration_seconds", "SQLite execute/commit latency", ("operation",))
+broadcast_seconds = metrics_registry.histogram("broadcast_duration_seconds", "WebSocket fan-out duration per telemetry point")
+replay_requests = metrics_registry.counter("ws_replay_requests_total", "WebSocket and SSE resumes by replay source", ("source",))
+broadcast_messages = metrics_registry.counter("broadcast_messages_total", "WebSocket messages sent", ("result",))
+geofence_events = metrics_registry.counter("geofence_events_total", "Geofence crossings by fence kind and direction", ("kind", "event"))
+telemetry_points = metrics_registry.counter("telemetry_points_total", "Ingested telemetry points by ordering outcome", ("result",))
+background_errors = metrics_registry.counter("background_errors_total", "Failed iterations of background loops", ("loop",))
+retention_purged = metrics_registry.counter("retention_purged_rows_total", "Rows deleted by the retention purge", ("table",))
+metrics_registry.gauge(
+    "websocket_connections",
+    "Open tracking WebSocket connections",
+    lambda: sum(1 for c in connected_clients.values() for s in c if not isinstance(s, _SseSubscriber)),
+)
+metrics_registry.gauge(
+    "sse_connections",
+    "Open tracking SSE streams",
+    lambda: sum(1 for c in connected_clients.values() for s in c if isinstance(s, _SseSubscriber)),
+)
+metrics_registry.gauge("longpoll_waiters", "Long-poll requests waiting for newer state", lambda: sum(w[1] for w in _state_waiters.values()))
+app.add_middleware(RequestMetricsMiddleware, histogram=http_request_seconds)
+
+
 class TelemetryIn(BaseModel):
     delivery_id: str
     lat: float
@@ -36,6 +119,14 @@ class TelemetryIn(BaseModel):
     progress: float
     status: str
     timestamp_utc: float
+    seq: Optional[int] = None
+    remaining_m: Optional[float] = None
+    trace_id: Optional[str] = None
+    emitted_at: Optional[float] = None
+    pickup_lat: Optional[float] = None
+    pickup_lng: Optional[float] = None
+    dropoff_lat: Optional[float] = None
+    dropoff_lng: Optional[float] = None
 
 
 class TelemetryOut(BaseModel):
@@ -45,47 +136,151 @@ class TelemetryOut(BaseModel):
     progress: float
     status: str
     timestamp_utc: float
+    seq: Optional[int] = None
+    eta_utc: Optional[float] = None
+
+
+class EtaOut(BaseModel):
+    delivery_id: str
+    status: Optional[str] = None
+    eta_utc: Optional[float] = None
+
+
+class StatusTransitionOut(BaseModel):
+    id: int
+    delivery_id: str
+    status: str
+    seq: Optional[int] = None
+    timestamp_utc: float
+
+
+class StatusTransitionsOut(BaseModel):
+    transitions: list[StatusTransitionOut]
+    next_after: int
+
+
+class GeofenceEventOut(BaseModel):
+    delivery_id: str
+    fence_id: str
+    kind: str
+    event: str
+    lat: float
+    lng: float
+    seq: Optional[int] = None
+    timestamp_utc: float
+
+
+class GeofenceIn(BaseModel):
+    kind: str = "restricted"
+    polygon: Optional[list[tuple[float, float]]] = None
+    center: Optional[tuple[float, float]] = None
+    radius_m: Optional[float] = None
+
+
+class TracePointOut(BaseModel):
+    timestamp_utc: float
+    status: str
+    transport_ms: Optional[float] = None
+    persist_ms: float
+    broadcast_ms: float
+    total_ms: float
+    subscribers: int
 
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+class TraceOut(BaseModel):
+    delivery_id: str
+    trace_id: Optional[str] = None
+    points: list[TracePointOut]
+    p50_ms: dict[str, float]
+    max_ms: dict[str, float]
+
+
+_db_pool = ConnectionPool(
+    create_backend(
+        DATABASE_URL,
+        busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        on_timing=lambda operation, seconds: sqlite_seconds.observe(seconds, operation),
+    ),
+    max_size=DB_POOL_SIZE,
+    acquire_timeout=DB_BUSY_TIMEOUT_MS / 1000,
+)
+
+
+def get_conn() -> ContextManager[sqlite3.Connection]:
+    return _db_pool.connection()
+
+
+def _ensure_column(cur: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    columns = {r["name"] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in columns:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
 
 
 def init_db() -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("PRAGMA foreign_keys = ON")
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS telemetry_events(
-          event_id TEXT PRIMARY KEY,
-          delivery_id TEXT,
-          lat REAL,
-          lng REAL,
-          progress REAL,
-          status TEXT,
-          timestamp_utc REAL
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS telemetry_events(
+              event_id TEXT PRIMARY KEY,
+              delivery_id TEXT,
+              lat REAL,
+              lng REAL,
+              progress REAL,
+              status TEXT,
+              timestamp_utc REAL
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS delivery_state(
-          delivery_id TEXT PRIMARY KEY,
-          lat REAL,
-          lng REAL,
-          progress REAL,
-          status TEXT,
-          timestamp_utc REAL
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS delivery_state(
+              delivery_id TEXT PRIMARY KEY,
+              lat REAL,
+              lng REAL,
+              progress REAL,
+              status TEXT,
+              timestamp_utc REAL
+            )
+            """
         )
-        """
-    )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_delivery_id ON telemetry_events(delivery_id)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry_events(timestamp_utc)")
-    conn.commit()
-    conn.close()
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_delivery_id ON telemetry_events(delivery_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry_events(timestamp_utc)")
+        _ensure_column(cur, "delivery_state", "eta_utc", "REAL")
+        _ensure_column(cur, "delivery_state", "seq", "INTEGER")
+        _ensure_column(cur, "telemetry_events", "seq", "INTEGER")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_delivery_seq ON telemetry_events(delivery_id, seq)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geofence_events(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              delivery_id TEXT,
+              fence_id TEXT,
+              kind TEXT,
+              event TEXT,
+              lat REAL,
+              lng REAL,
+              seq INTEGER,
+              timestamp_utc REAL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_geofence_events_delivery_id ON geofence_events(delivery_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_geofence_events_ts ON geofence_events(timestamp_utc)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS status_transitions(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              delivery_id TEXT,
+              status TEXT,
+              seq INTEGER,
+              timestamp_utc REAL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_status_transitions_ts ON status_transitions(timestamp_utc)")
+        conn.commit()
 
 
 init_db()
@@ -102,14 +297,20 @@ def _load_public_key() -> str:
     raise HTTPException(status_code=500, detail="JWT_PUBLIC_KEY not configured")
 
 
+@lru_cache(maxsize=1)
+def _verifying_key():
+    return serialization.load_pem_public_key(_load_public_key().encode("utf-8"))
+
+
 def _decode_token(token: str) -> dict:
-    return jwt.decode(
-        token,
-        _load_public_key(),
-        algorithms=["RS256"],
-        audience=JWT_AUDIENCE,
-        issuer=JWT_ISSUER,
-    )
+    with jwt_seconds.time("verify"):
+        return jwt.decode(
+            token,
+            _verifying_key(),
+            algorithms=["RS256"],
+            audience=JWT_AUDIENCE,
+            issuer=JWT_ISSUER,
+        )
 
 
 def _extract_bearer(authorization: Optional[str]) -> Optional[str]:
@@ -143,40 +344,100 @@ def require_auth(
     return claims
 
 
-connected_clients: dict[str, set[WebSocket]] = {}
+class _Subscriber(ABC):
+    def __init__(self, delivery_id: str, max_hz: Optional[float] = None) -> None:
+        self.delivery_id = delivery_id
+        self.shaper = RateShaper(max_hz)
+
+    @abstractmethod
+    async def send_text(self, message: str) -> None:
+        pass
+
+
+class _WebSocketSubscriber(_Subscriber):
+    def __init__(self, websocket: WebSocket, delivery_id: str, max_hz: Optional[float] = None) -> None:
+        super().__init__(delivery_id, max_hz)
+        self.websocket = websocket
+
+    async def send_text(self, message: str) -> None:
+        await self.websocket.send_text(message)
+
+
+class _SseSubscriber(_Subscriber):
+    def __init__(self, delivery_id: str, max_hz: Optional[float] = None) -> None:
+        super().__init__(delivery_id, max_hz)
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self.overflowed = False
+
+    async def send_text(self, message: str) -> None:
+        if self.queue.qsize() >= SSE_MAX_PENDING:
+            self.overflowed = True
+            raise RuntimeError("SSE subscriber is not keeping up")
+        self.queue.put_nowait(message)
+
+
+connected_clients: dict[str, set[_Subscriber]] = {}
 clients_lock = asyncio.Lock()
+_state_waiters: dict[str, list] = {}
+_timer_wheel = TimerWheel(SHAPING_TICK_SECONDS)
+eta_tracker = EtaTracker(alpha=ETA_SPEED_ALPHA)
+sequence_tracker = SequenceTracker(window=SEQUENCE_WINDOW)
+_last_statuses: dict[str, str] = {}
+replay_buffer = ReplayBuffer(REPLAY_BUFFER_SIZE, REPLAY_MAX_DELIVERIES)
+geofence_index = GeofenceIndex(GEOFENCE_CELL_DEG)
+for _fence in load_geofences(GEOFENCES_PATH):
+    geofence_index.add(_fence)
+geofence_engine = GeofenceEngine(geofence_index, GEOFENCE_PICKUP_RADIUS_M, GEOFENCE_CUSTOMER_RADIUS_M)
+_traces = TraceStore(TRACE_MAX_DELIVERIES, TRACE_MAX_SPANS_PER_DELIVERY, TRACE_LOG_PATH)
 
 
-def _persist_telemetry(payload: TelemetryIn) -> None:
-    conn = get_conn()
-    try:
+def _event_id(payload: TelemetryIn) -> str:
+    if payload.seq is not None:
+        return f"{payload.delivery_id}:{payload.seq}"
+    return f"{payload.delivery_id}-{payload.timestamp_utc}"
+
+
+def _persist_history(cur: sqlite3.Cursor, payload: TelemetryIn) -> None:
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO telemetry_events (event_id, delivery_id, lat, lng, progress, status, timestamp_utc, seq)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            _event_id(payload),
+            payload.delivery_id,
+            payload.lat,
+            payload.lng,
+            payload.progress,
+            payload.status,
+            payload.timestamp_utc,
+            payload.seq,
+        ),
+    )
+
+
+def _persist_telemetry(
+    payload: TelemetryIn,
+    eta_utc: Optional[float],
+    crossings: list[GeofenceEventOut],
+    status_changed: bool,
+) -> bool:
+    with get_conn() as conn:
         cur = conn.cursor()
-        event_id = f"{payload.delivery_id}-{payload.timestamp_utc}"
+        _persist_history(cur, payload)
         cur.execute(
             """
-            INSERT OR REPLACE INTO telemetry_events (event_id, delivery_id, lat, lng, progress, status, timestamp_utc)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                event_id,
-                payload.delivery_id,
-                payload.lat,
-                payload.lng,
-                payload.progress,
-                payload.status,
-                payload.timestamp_utc,
-            ),
-        )
-        cur.execute(
-            """
-            INSERT INTO delivery_state (delivery_id, lat, lng, progress, status, timestamp_utc)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO delivery_state (delivery_id, lat, lng, progress, status, timestamp_utc, eta_utc, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(delivery_id) DO UPDATE SET
               lat = excluded.lat,
               lng = excluded.lng,
               progress = excluded.progress,
               status = excluded.status,
-              timestamp_utc = excluded.timestamp_utc
+              timestamp_utc = excluded.timestamp_utc,
+              eta_utc = excluded.eta_utc,
+              seq = excluded.seq
+            WHERE COALESCE(excluded.seq > delivery_state.seq, excluded.timestamp_utc >= delivery_state.timestamp_utc)
             """,
             (
                 payload.delivery_id,
@@ -185,62 +446,561 @@ def _persist_telemetry(payload: TelemetryIn) -> None:
                 payload.progress,
                 payload.status,
                 payload.timestamp_utc,
+                eta_utc,
+                payload.seq,
             ),
         )
+        applied = cur.rowcount > 0
+        if applied and crossings:
+            cur.executemany(
+                """
+                INSERT INTO geofence_events (delivery_id, fence_id, kind, event, lat, lng, seq, timestamp_utc)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(e.delivery_id, e.fence_id, e.kind, e.event, e.lat, e.lng, e.seq, e.timestamp_utc) for e in crossings],
+            )
+        if applied and status_changed:
+            cur.execute(
+                "INSERT INTO status_transitions (delivery_id, status, seq, timestamp_utc) VALUES (?, ?, ?, ?)",
+                (payload.delivery_id, payload.status, payload.seq, payload.timestamp_utc),
+            )
+        conn.commit()
+        return applied
+
+
+def _remember_status(delivery_id: str, status: str) -> None:
+    if status in TERMINAL_STATUSES:
+        _last_statuses.pop(delivery_id, None)
+        return
+    if delivery_id not in _last_statuses and len(_last_statuses) >= STATUS_CACHE_SIZE:
+        _last_statuses.pop(next(iter(_last_statuses)))
+    _last_statuses[delivery_id] = status
+
+
+def _get_status_transitions(after: int, limit: int) -> list[StatusTransitionOut]:
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            "SELECT id, delivery_id, status, seq, timestamp_utc FROM status_transitions WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+    return [StatusTransitionOut(**dict(r)) for r in rows]
+
+
+def _persist_reordered(payload: TelemetryIn) -> None:
+    with get_conn() as conn:
+        _persist_history(conn.cursor(), payload)
         conn.commit()
-    finally:
-        conn.close()
+
+
+def _get_etas(delivery_ids: list[str]) -> list[EtaOut]:
+    placeholders = ",".join("?" * len(delivery_ids))
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            f"SELECT delivery_id, status, eta_utc FROM delivery_state WHERE delivery_id IN ({placeholders})",
+            tuple(delivery_ids),
+        ).fetchall()
+    found = {r["delivery_id"]: r for r in rows}
+    out = []
+    for delivery_id in delivery_ids:
+        row = found.get(delivery_id)
+        live = eta_tracker.get(delivery_id)
+        out.append(
+            EtaOut(
+                delivery_id=delivery_id,
+                status=row["status"] if row else None,
+                eta_utc=live if live is not None else (row["eta_utc"] if row else None),
+            )
+        )
+    return out
 
 
 def _get_state(delivery_id: str) -> Optional[TelemetryOut]:
-    conn = get_conn()
-    try:
+    with get_conn() as conn:
         row = conn.cursor().execute(
-            "SELECT delivery_id, lat, lng, progress, status, timestamp_utc FROM delivery_state WHERE delivery_id = ?",
+            "SELECT delivery_id, lat, lng, progress, status, timestamp_utc, seq, eta_utc FROM delivery_state WHERE delivery_id = ?",
             (delivery_id,),
         ).fetchone()
         if not row:
             return None
         return TelemetryOut(**dict(row))
+
+
+def _get_history(delivery_id: str, after_seq: int) -> list[tuple[int, str]]:
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            """
+            SELECT delivery_id, lat, lng, progress, status, timestamp_utc, seq
+            FROM telemetry_events
+            WHERE delivery_id = ? AND seq > ?
+            ORDER BY seq
+            LIMIT ?
+            """,
+            (delivery_id, after_seq, REPLAY_DB_MAX_EVENTS),
+        ).fetchall()
+    return [(r["seq"], json.dumps(TelemetryOut(**dict(r)).model_dump())) for r in rows]
+
+
+async def _wait_for_update(delivery_id: str, timeout: float) -> None:
+    waiter = _state_waiters.get(delivery_id)
+    if waiter is None:
+        waiter = _state_waiters[delivery_id] = [asyncio.Event(), 0]
+    waiter[1] += 1
+    try:
+        await asyncio.wait_for(waiter[0].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
     finally:
-        conn.close()
+        waiter[1] -= 1
+        if not waiter[1] and _state_waiters.get(delivery_id) is waiter:
+            del _state_waiters[delivery_id]
+
 
+def _state_version(state: TelemetryOut) -> int:
+    return state.seq if state.seq is not None else int(state.timestamp_utc * 1000)
 
-async def _broadcast(delivery_id: str, payload: dict) -> None:
+
+def _current_state(delivery_id: str) -> Optional[tuple[int, str]]:
+    latest = replay_buffer.latest(delivery_id)
+    if latest is not None:
+        return latest
+    state = _get_state(delivery_id)
+    if not state:
+        return None
+    return _state_version(state), json.dumps(state.model_dump())
+
+
+def _sse_event(message: str) -> str:
+    seq = json.loads(message).get("seq")
+    prefix = f"id: {seq}\n" if seq is not None else ""
+    return f"{prefix}data: {message}\n\n"
+
+
+async def _broadcast(delivery_id: str, payload: dict) -> int:
+    message = json.dumps(payload)
     async with clients_lock:
+        if payload.get("seq") is not None:
+            replay_buffer.append(delivery_id, payload["seq"], message)
         targets = list(connected_clients.get(delivery_id, set()))
+    waiter = _state_waiters.pop(delivery_id, None)
+    if waiter:
+        waiter[0].set()
     if not targets:
-        return
+        return 0
 
-    message = json.dumps(payload)
+    now = time.monotonic()
+    status = payload.get("status")
+    ready = []
+    for subscriber in targets:
+        if subscriber.shaper.offer(message, status, now):
+            ready.append(subscriber)
+        elif not subscriber.shaper.scheduled:
+            subscriber.shaper.scheduled = True
+            _timer_wheel.schedule(subscriber, subscriber.shaper.due_at())
+    if len(ready) < len(targets):
+        broadcast_messages.inc("coalesced", amount=len(targets) - len(ready))
+    with broadcast_seconds.time():
+        return await _deliver(ready, message, status)
+
+
+async def _deliver(subscribers: list[_Subscriber], message: str, status: Optional[str], shaped: bool = True) -> int:
+    now = time.monotonic()
     dead = []
-    for ws in targets:
+    for subscriber in subscribers:
         try:
-            await ws.send_text(message)
+            await subscriber.send_text(message)
         except Exception:
-            dead.append(ws)
+            dead.append(subscriber)
+        else:
+            if shaped:
+                subscriber.shaper.sent(status, now)
+    broadcast_messages.inc("sent", amount=len(subscribers) - len(dead))
+    if dead:
+        broadcast_messages.inc("failed", amount=len(dead))
 
     if dead:
         async with clients_lock:
-            for ws in dead:
-                connected_clients.get(delivery_id, set()).discard(ws)
+            for subscriber in dead:
+                connected_clients.get(subscriber.delivery_id, set()).discard(subscriber)
+    return len(subscribers) - len(dead)
+
+
+async def _publish_geofence_events(delivery_id: str, crossings: list[GeofenceEventOut]) -> None:
+    async with clients_lock:
+        targets = list(connected_clients.get(delivery_id, set()))
+    if not targets:
+        return
+    for crossing in crossings:
+        message = {"type": "geofence", **crossing.model_dump(exclude={"lat", "lng"}), "position": [crossing.lat, crossing.lng]}
+        await _deliver(targets, json.dumps(message), None, shaped=False)
+
+
+def _evaluate_geofences(payload: TelemetryIn) -> tuple[list[GeofenceEventOut], frozenset[Fence]]:
+    delivery_id = payload.delivery_id
+    if not geofence_engine.has_delivery_fences(delivery_id) and (payload.pickup_lat is not None or payload.dropoff_lat is not None):
+        geofence_engine.set_delivery_fences(
+            delivery_id,
+            (payload.pickup_lat, payload.pickup_lng) if payload.pickup_lat is not None and payload.pickup_lng is not None else None,
+            (payload.dropoff_lat, payload.dropoff_lng) if payload.dropoff_lat is not None and payload.dropoff_lng is not None else None,
+        )
+    events, inside = geofence_engine.check(delivery_id, payload.lat, payload.lng)
+    crossings = [
+        GeofenceEventOut(
+            delivery_id=delivery_id,
+            fence_id=fence.id,
+            kind=fence.kind,
+            event=event,
+            lat=payload.lat,
+            lng=payload.lng,
+            seq=payload.seq,
+            timestamp_utc=payload.timestamp_utc,
+        )
+        for event, fence in events
+    ]
+    return crossings, inside
+
+
+def _commit_geofences(payload: TelemetryIn, crossings: list[GeofenceEventOut], inside: frozenset[Fence]) -> None:
+    if payload.status in TERMINAL_STATUSES:
+        geofence_engine.forget(payload.delivery_id)
+    else:
+        geofence_engine.commit(payload.delivery_id, inside)
+    for crossing in crossings:
+        geofence_events.inc(crossing.kind, crossing.event)
+
+
+def _record_seq(payload: TelemetryIn) -> None:
+    if payload.seq is not None:
+        sequence_tracker.record(payload.delivery_id, payload.seq)
+
+
+def _background_failure(loop: str, failures: int, exc: Exception, interval: float) -> float:
+    background_errors.inc(loop)
+    if failures == 1:
+        logger.warning("Background loop %s error: %s", loop, exc)
+    return min(BACKGROUND_BACKOFF_MAX_SECONDS, interval * 2 ** failures)
+
+
+async def _shaping_loop() -> None:
+    failures = 0
+    delay = SHAPING_TICK_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            now = time.monotonic()
+            for subscriber in _timer_wheel.advance(now):
+                if subscriber.shaper.pending is not None and subscriber.shaper.due_at() > now:
+                    _timer_wheel.schedule(subscriber, subscriber.shaper.due_at())
+                    continue
+                subscriber.shaper.scheduled = False
+                pending = subscriber.shaper.pending
+                subscriber.shaper.pending = None
+                if pending is None or subscriber not in connected_clients.get(subscriber.delivery_id, ()):
+                    continue
+                await _deliver([subscriber], *pending)
+        except Exception as exc:
+            failures += 1
+            delay = _background_failure("shaping", failures, exc, SHAPING_TICK_SECONDS)
+        else:
+            failures = 0
+            delay = SHAPING_TICK_SECONDS
+
+
+def _delete_expired_batch(table: str, cutoff: float) -> int:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            DELETE FROM {table} WHERE rowid IN (
+              SELECT rowid FROM {table} WHERE timestamp_utc < ? LIMIT ?
+            )
+            """,
+            (cutoff, RETENTION_PURGE_BATCH_SIZE),
+        )
+        deleted = cur.rowcount
+        conn.commit()
+    return deleted
+
+
+async def _purge_expired(table: str, retention_seconds: float) -> int:
+    cutoff = time.time() - retention_seconds
+    purged = 0
+    while True:
+        deleted = await asyncio.to_thread(_delete_expired_batch, table, cutoff)
+        purged += deleted
+        if deleted < RETENTION_PURGE_BATCH_SIZE:
+            break
+    if purged:
+        retention_purged.inc(table, amount=purged)
+    return purged
+
+
+async def _retention_loop() -> None:
+    failures = 0
+    while True:
+        try:
+            await _purge_expired("status_transitions", STATUS_TRANSITIONS_RETENTION_SECONDS)
+            await _purge_expired("geofence_events", GEOFENCE_EVENTS_RETENTION_SECONDS)
+        except Exception as exc:
+            failures += 1
+            await asyncio.sleep(_background_failure("retention", failures, exc, RETENTION_PURGE_INTERVAL_SECONDS))
+            continue
+        failures = 0
+        await asyncio.sleep(RETENTION_PURGE_INTERVAL_SECONDS)
 
 
 @app.post("/telemetry")
 async def ingest_telemetry(payload: TelemetryIn, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["drone_device"]))):
-    _persist_telemetry(payload)
-    await _broadcast(payload.delivery_id, payload.model_dump())
+    accepted_at = time.time()
+    ordering = IN_ORDER if payload.seq is None else sequence_tracker.classify(payload.delivery_id, payload.seq)
+    if ordering == DUPLICATE:
+        telemetry_points.inc("duplicate")
+        return {"status": "duplicate"}
+    if ordering != IN_ORDER:
+        _persist_reordered(payload)
+        _record_seq(payload)
+        telemetry_points.inc("reordered")
+        return {"status": "reordered"}
+
+    eta_utc, estimate = eta_tracker.estimate(
+        payload.delivery_id,
+        payload.lat,
+        payload.lng,
+        payload.progress,
+        payload.status,
+        payload.timestamp_utc,
+        payload.remaining_m,
+    )
+    crossings, inside = _evaluate_geofences(payload)
+    status_changed = _last_statuses.get(payload.delivery_id) != payload.status
+    applied = _persist_telemetry(payload, eta_utc, crossings, status_changed)
+    _record_seq(payload)
+    if not applied:
+        telemetry_points.inc("reordered")
+        return {"status": "reordered"}
+    eta_tracker.commit(payload.delivery_id, estimate)
+    _commit_geofences(payload, crossings, inside)
+    _remember_status(payload.delivery_id, payload.status)
+    telemetry_points.inc("applied")
+    persisted_at = time.time()
+    message = TelemetryOut(**payload.model_dump(include=TelemetryOut.model_fields.keys() - {"eta_utc"}), eta_utc=eta_utc)
+    subscribers = await _broadcast(payload.delivery_id, message.model_dump())
+    if crossings:
+        await _publish_geofence_events(payload.delivery_id, crossings)
+    _traces.record(
+        payload.delivery_id,
+        payload.trace_id,
+        "telemetry",
+        timestamp_utc=payload.timestamp_utc,
+        seq=payload.seq,
+        status=payload.status,
+        emitted_at=payload.emitted_at,
+        accepted_at=accepted_at,
+        persisted_at=persisted_at,
+        broadcast_at=time.time(),
+        subscribers=subscribers,
+    )
     return {"status": "ok"}
 
 
 @app.get("/track/{delivery_id}", response_model=TelemetryOut)
-def get_tracking(delivery_id: str, claims: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, scopes=["tracking:read"]))):
+async def get_tracking(
+    delivery_id: str,
+    after_version: Optional[int] = None,
+    timeout: float = Query(default=LONGPOLL_MAX_TIMEOUT_SECONDS, gt=0),
+    if_none_match: Optional[str] = Header(default=None),
+    claims: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, scopes=["tracking:read"])),
+):
     if claims.get("sub") != delivery_id:
         raise HTTPException(status_code=403, detail="Invalid delivery scope")
-    state = _get_state(delivery_id)
-    if not state:
+    current = _current_state(delivery_id)
+    if after_version is not None:
+        deadline = time.monotonic() + min(timeout, LONGPOLL_MAX_TIMEOUT_SECONDS)
+        while current is None or current[0] <= after_version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await _wait_for_update(delivery_id, remaining)
+            current = _current_state(delivery_id)
+    if current is None:
         raise HTTPException(status_code=404, detail="No telemetry")
-    return state
+
+    version, body = current
+    etag = f'"{version}"'
+    if if_none_match == etag or (after_version is not None and version <= after_version):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/sse/track/{delivery_id}", response_class=StreamingResponse)
+async def sse_track(
+    delivery_id: str,
+    token: Optional[str] = None,
+    since: Optional[int] = None,
+    max_hz: Optional[float] = Query(default=None, gt=0),
+    authorization: Optional[str] = Header(default=None),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    token = _extract_bearer(authorization) or token
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    try:
+        claims = _decode_token(token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if claims.get("sub") != delivery_id or "tracking:read" not in set(claims.get("scopes", [])):
+        raise HTTPException(status_code=403, detail="Invalid delivery scope")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    subscriber = _SseSubscriber(delivery_id, max_hz)
+
+    async def _stream():
+        try:
+            async for message in _catch_up(delivery_id, subscriber, since):
+                yield _sse_event(message)
+            while not subscriber.overflowed:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_event(message)
+        finally:
+            await _detach(delivery_id, subscriber)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/eta", response_model=list[EtaOut])
+def get_etas(ids: str, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"]))):
+    delivery_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not delivery_ids:
+        raise HTTPException(status_code=422, detail="No delivery ids")
+    if len(delivery_ids) > ETA_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {ETA_MAX_IDS} ids per request")
+    return _get_etas(delivery_ids)
+
+
+def _trace_point(span: dict) -> TracePointOut:
+    emitted_at = span["emitted_at"]
+    return TracePointOut(
+        timestamp_utc=span["timestamp_utc"],
+        status=span["status"],
+        transport_ms=(span["accepted_at"] - emitted_at) * 1000 if emitted_at is not None else None,
+        persist_ms=(span["persisted_at"] - span["accepted_at"]) * 1000,
+        broadcast_ms=(span["broadcast_at"] - span["persisted_at"]) * 1000,
+        total_ms=(span["broadcast_at"] - (emitted_at if emitted_at is not None else span["accepted_at"])) * 1000,
+        subscribers=span["subscribers"],
+    )
+
+
+@app.get("/traces/{delivery_id}", response_model=TraceOut)
+def get_trace(delivery_id: str, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"]))):
+    spans = _traces.get(delivery_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="No trace")
+    points = [_trace_point(span) for span in spans]
+    p50_ms: dict[str, float] = {}
+    max_ms: dict[str, float] = {}
+    for hop in ("transport_ms", "persist_ms", "broadcast_ms", "total_ms"):
+        values = sorted(v for v in (getattr(p, hop) for p in points) if v is not None)
+        if values:
+            p50_ms[hop] = values[len(values) // 2]
+            max_ms[hop] = values[-1]
+    return TraceOut(delivery_id=delivery_id, trace_id=spans[-1]["trace_id"], points=points, p50_ms=p50_ms, max_ms=max_ms)
+
+
+async def _catch_up(delivery_id: str, subscriber: _Subscriber, last_seq: Optional[int]) -> AsyncIterator[str]:
+    if last_seq is None:
+        async with clients_lock:
+            latest = replay_buffer.latest(delivery_id)
+            connected_clients.setdefault(delivery_id, set()).add(subscriber)
+        if latest is not None:
+            yield latest[1]
+        else:
+            state = _get_state(delivery_id)
+            if state:
+                yield json.dumps(state.model_dump())
+        return
+
+    source = "memory"
+    history_exhausted = False
+    while True:
+        async with clients_lock:
+            missed = replay_buffer.since(delivery_id, last_seq)
+            if missed == [] or (missed is None and history_exhausted):
+                connected_clients.setdefault(delivery_id, set()).add(subscriber)
+                break
+        if missed is None:
+            source = "db"
+            missed = _get_history(delivery_id, last_seq)
+            history_exhausted = len(missed) < REPLAY_DB_MAX_EVENTS
+        for seq, message in missed:
+            yield message
+            last_seq = seq
+    replay_requests.inc(source)
+
+
+async def _attach(delivery_id: str, subscriber: _Subscriber, last_seq: Optional[int]) -> None:
+    async for message in _catch_up(delivery_id, subscriber, last_seq):
+        await subscriber.send_text(message)
+
+
+async def _detach(delivery_id: str, subscriber: _Subscriber) -> None:
+    async with clients_lock:
+        subscribers = connected_clients.get(delivery_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del connected_clients[delivery_id]
+
+
+@app.get("/status-transitions", response_model=StatusTransitionsOut)
+def get_status_transitions(
+    after: int = 0,
+    limit: int = Query(default=500, gt=0),
+    _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"])),
+):
+    transitions = _get_status_transitions(after, min(limit, STATUS_TRANSITIONS_MAX_BATCH))
+    return StatusTransitionsOut(transitions=transitions, next_after=transitions[-1].id if transitions else after)
+
+
+@app.get("/geofences/events/{delivery_id}", response_model=list[GeofenceEventOut])
+def get_geofence_events(delivery_id: str, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["operator", "admin"]))):
+    with get_conn() as conn:
+        rows = conn.cursor().execute(
+            """
+            SELECT delivery_id, fence_id, kind, event, lat, lng, seq, timestamp_utc
+            FROM geofence_events
+            WHERE delivery_id = ?
+            ORDER BY id
+            """,
+            (delivery_id,),
+        ).fetchall()
+    return [GeofenceEventOut(**dict(r)) for r in rows]
+
+
+@app.put("/geofences/{fence_id}")
+async def put_geofence(fence_id: str, payload: GeofenceIn, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["admin"]))):
+    if payload.polygon and len(payload.polygon) >= 3:
+        fence = Fence.polygon(fence_id, payload.kind, list(payload.polygon))
+    elif payload.center and payload.radius_m and payload.radius_m > 0:
+        fence = Fence.circle(fence_id, payload.kind, payload.center[0], payload.center[1], payload.radius_m)
+    else:
+        raise HTTPException(status_code=422, detail="Provide a polygon with at least 3 points or a center with radius_m")
+    geofence_index.add(fence)
+    return {"status": "ok", "fence_id": fence_id, "fences": len(geofence_index)}
+
+
+@app.delete("/geofences/{fence_id}")
+async def delete_geofence(fence_id: str, _: dict = Depends(lambda authorization=Header(default=None): require_auth(authorization, roles=["admin"]))):
+    if geofence_index.remove(fence_id) is None:
+        raise HTTPException(status_code=404, detail="Fence not found")
+    return {"status": "ok", "fence_id": fence_id, "fences": len(geofence_index)}
 
 
 @app.websocket("/ws/track/{delivery_id}")
@@ -258,13 +1018,21 @@ async def websocket_track(websocket: WebSocket, delivery_id: str):
         await websocket.close(code=4403)
         return
 
-    await websocket.accept()
-    async with clients_lock:
-        connected_clients.setdefault(delivery_id, set()).add(websocket)
+    since = websocket.query_params.get("since")
+    max_hz = websocket.query_params.get("max_hz")
+    try:
+        last_seq = int(since) if since is not None else None
+        max_hz = float(max_hz) if max_hz is not None else None
+    except ValueError:
+        await websocket.close(code=4400)
+        return
+    if max_hz is not None and max_hz <= 0:
+        await websocket.close(code=4400)
+        return
 
-    state = _get_state(delivery_id)
-    if state:
-        await websocket.send_text(json.dumps(state.model_dump()))
+    await websocket.accept()
+    subscriber = _WebSocketSubscriber(websocket, delivery_id, max_hz)
+    await _attach(delivery_id, subscriber, last_seq)
 
     try:
         while True:
@@ -272,8 +1040,12 @@ async def websocket_track(websocket: WebSocket, delivery_id: str):
     except Exception:
         pass
     finally:
-        async with clients_lock:
-            connected_clients.get(delivery_id, set()).discard(websocket)
+        await _detach(delivery_id, subscriber)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -0,0 +1,30 @@
+from collections import OrderedDict, deque
+
+
+class ReplayBuffer:
+    def __init__(self, events_per_delivery: int = 64, max_deliveries: int = 5000) -> None:
+        self.events_per_delivery = events_per_delivery
+        self.max_deliveries = max_deliveries
+        self._events: OrderedDict[str, deque[tuple[int, str]]] = OrderedDict()
+
+    def append(self, delivery_id: str, seq: int, message: str) -> None:
+        events = self._events.get(delivery_id)
+        if events is None:
+            events = self._events[delivery_id] = deque(maxlen=self.events_per_delivery)
+            if len(self._events) > self.max_deliveries:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(delivery_id)
+        events.append((seq, message))
+
+    def latest(self, delivery_id: str) -> tuple[int, str] | None:
+        events = self._events.get(delivery_id)
+        return events[-1] if events else None
+
+    def since(self, delivery_id: str, seq: int) -> list[tuple[int, str]] | None:
+        events = self._events.get(delivery_id)
+        if not events:
+            return None
+        if events[0][0] > seq + 1:
+            return None
+        return [e for e in events if e[0] > seq]
@@ -0,0 +1,39 @@
+IN_ORDER = "in_order"
+REORDERED = "reordered"
+DUPLICATE = "duplicate"
+
+
+class SequenceTracker:
+    def __init__(self, window: int = 64, max_entries: int = 100000) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._marks: dict[str, list[int]] = {}
+
+    def classify(self, delivery_id: str, seq: int) -> str:
+        mark = self._marks.get(delivery_id)
+        if mark is None or seq > mark[0]:
+            return IN_ORDER
+        offset = mark[0] - seq
+        if offset >= self.window:
+            return REORDERED
+        if mark[1] & (1 << offset):
+            return DUPLICATE
+        return REORDERED
+
+    def record(self, delivery_id: str, seq: int) -> None:
+        mark = self._marks.get(delivery_id)
+        if mark is None:
+            if len(self._marks) >= self.max_entries:
+                self._marks.pop(next(iter(self._marks)))
+            self._marks[delivery_id] = [seq, 1]
+            return
+
+        high, seen = mark
+        if seq > high:
+            shift = seq - high
+            mark[0] = seq
+            mark[1] = ((seen << shift) | 1) & ((1 << self.window) - 1) if shift < self.window else 1
+            return
+        offset = high - seq
+        if offset < self.window:
+            mark[1] = seen | (1 << offset)
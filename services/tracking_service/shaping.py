@@ -0,0 +1,58 @@
+import math
+
+
+class RateShaper:
+    __slots__ = ("min_interval", "last_sent_at", "last_status", "pending", "scheduled")
+
+    def __init__(self, max_hz: float | None = None) -> None:
+        self.min_interval = 1.0 / max_hz if max_hz else 0.0
+        self.last_sent_at = -math.inf
+        self.last_status: str | None = None
+        self.pending: tuple[str, str | None] | None = None
+        self.scheduled = False
+
+    def offer(self, message: str, status: str | None, now: float) -> bool:
+        if status != self.last_status or now - self.last_sent_at >= self.min_interval:
+            self.pending = None
+            return True
+        self.pending = (message, status)
+        return False
+
+    def sent(self, status: str | None, now: float) -> None:
+        self.last_sent_at = now
+        self.last_status = status
+
+    def due_at(self) -> float:
+        return self.last_sent_at + self.min_interval
+
+
+class TimerWheel:
+    def __init__(self, tick_seconds: float = 0.05, slots: int = 512) -> None:
+        self.tick_seconds = tick_seconds
+        self.slots: list[list[tuple[float, object]]] = [[] for _ in range(slots)]
+        self._tick: int | None = None
+
+    def schedule(self, item: object, due: float) -> None:
+        tick = math.ceil(due / self.tick_seconds)
+        if self._tick is not None and tick <= self._tick:
+            tick = self._tick + 1
+        self.slots[tick % len(self.slots)].append((due, item))
+
+    def advance(self, now: float) -> list:
+        target = math.floor(now / self.tick_seconds)
+        if self._tick is None:
+            self._tick = target - 1
+        fired = []
+        for tick in range(self._tick + 1, min(target, self._tick + len(self.slots)) + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            keep = []
+            for due, item in slot:
+                if due <= now:
+                    fired.append(item)
+                else:
+                    keep.append((due, item))
+            self.slots[tick % len(self.slots)] = keep
+        self._tick = target
+        return fired
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp(prefix='tracking_tests_')) / 'tracking.db'}"
+os.environ["JWT_PUBLIC_KEY"] = _key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode("utf-8")
+
+
+@pytest.fixture
+def main(monkeypatch):
+    import main
+
+    with main.get_conn() as conn:
+        for table in ("telemetry_events", "delivery_state", "geofence_events", "status_transitions"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+    monkeypatch.setattr(main, "clients_lock", asyncio.Lock())
+    monkeypatch.setattr(main, "replay_buffer", main.ReplayBuffer(main.REPLAY_BUFFER_SIZE, main.REPLAY_MAX_DELIVERIES))
+    monkeypatch.setattr(main, "sequence_tracker", main.SequenceTracker(window=main.SEQUENCE_WINDOW))
+    monkeypatch.setattr(main, "eta_tracker", main.EtaTracker(alpha=main.ETA_SPEED_ALPHA))
+    main.connected_clients.clear()
+    main._state_waiters.clear()
+    main._last_statuses.clear()
+    return main
+
+
+@pytest.fixture
+def token(main):
+    def _token(subject: str, role: str = "customer", scopes: tuple[str, ...] = ("tracking:read",)) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": subject,
+            "role": role,
+            "scopes": list(scopes),
+            "iss": main.JWT_ISSUER,
+            "aud": main.JWT_AUDIENCE,
+            "iat": now,
+            "exp": now + 300,
+        }
+        return jwt.encode(claims, _key, algorithm="RS256")
+
+    return _token
+
+
+@pytest.fixture
+def telemetry(main):
+    def _telemetry(delivery_id: str, seq: int | None = None, status: str = "IN_FLIGHT", timestamp_utc: float | None = None, **fields):
+        return main.TelemetryIn(
+            delivery_id=delivery_id,
+            lat=fields.pop("lat", 43.24),
+            lng=fields.pop("lng", 76.90),
+            progress=fields.pop("progress", 0.5),
+            status=status,
+            timestamp_utc=timestamp_utc if timestamp_utc is not None else time.time(),
+            seq=seq,
+            **fields,
+        )
+
+    return _telemetry
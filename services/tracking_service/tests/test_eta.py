@@ -0,0 +1,92 @@
+import pytest
+
+from eta import EtaTracker, haversine_m
+
+A = (43.24, 76.90)
+B = (43.241, 76.90)
+
+
+def _start(tracker: EtaTracker, **kwargs):
+    eta, est = tracker.estimate("d-1", *A, 0.0, "IN_FLIGHT", 1000.0, **kwargs)
+    tracker.commit("d-1", est)
+    return eta
+
+
+def test_first_point_has_no_eta():
+    tracker = EtaTracker()
+
+    assert _start(tracker, remaining_m=1000.0) is None
+    assert tracker.get("d-1") is None
+
+
+def test_eta_uses_reported_remaining_distance():
+    tracker = EtaTracker()
+    _start(tracker, remaining_m=1000.0)
+
+    eta, est = tracker.estimate("d-1", *B, 0.1, "IN_FLIGHT", 1010.0, remaining_m=880.0)
+
+    assert est.speed_mps == pytest.approx(12.0)
+    assert eta == pytest.approx(1010.0 + 880.0 / 12.0)
+
+
+def test_eta_falls_back_to_progress_without_remaining_distance():
+    tracker = EtaTracker()
+    _start(tracker)
+
+    eta, est = tracker.estimate("d-1", *B, 0.25, "IN_FLIGHT", 1010.0)
+
+    step_m = haversine_m(*A, *B)
+    assert eta == pytest.approx(1010.0 + step_m * 3 / (step_m / 10.0))
+
+
+def test_speed_is_smoothed():
+    tracker = EtaTracker(alpha=0.5)
+    _start(tracker, remaining_m=1000.0)
+    _, est = tracker.estimate("d-1", *B, 0.1, "IN_FLIGHT", 1010.0, remaining_m=880.0)
+    tracker.commit("d-1", est)
+
+    _, est = tracker.estimate("d-1", *B, 0.2, "IN_FLIGHT", 1020.0, remaining_m=840.0)
+
+    assert est.speed_mps == pytest.approx(0.5 * 4.0 + 0.5 * 12.0)
+
+
+def test_uncommitted_estimate_leaves_tracker_unchanged():
+    tracker = EtaTracker()
+    _start(tracker, remaining_m=1000.0)
+    _, est = tracker.estimate("d-1", *B, 0.1, "IN_FLIGHT", 1010.0, remaining_m=880.0)
+    tracker.commit("d-1", est)
+    committed = tracker.get("d-1")
+
+    tracker.estimate("d-1", *A, 0.2, "IN_FLIGHT", 1020.0, remaining_m=100.0)
+
+    assert tracker.get("d-1") == committed
+
+
+def test_stale_point_keeps_previous_eta():
+    tracker = EtaTracker()
+    _start(tracker, remaining_m=1000.0)
+    eta, est = tracker.estimate("d-1", *B, 0.1, "IN_FLIGHT", 1010.0, remaining_m=880.0)
+    tracker.commit("d-1", est)
+
+    assert tracker.estimate("d-1", *A, 0.05, "IN_FLIGHT", 1005.0, remaining_m=950.0) == (eta, est)
+
+
+def test_terminal_status_ends_tracking():
+    tracker = EtaTracker()
+    _start(tracker, remaining_m=1000.0)
+
+    eta, est = tracker.estimate("d-1", *B, 1.0, "DELIVERED", 1100.0)
+    tracker.commit("d-1", est)
+
+    assert eta == 1100.0
+    assert tracker.get("d-1") is None
+    assert tracker.estimate("d-2", *B, 0.5, "CANCELLED", 1100.0) == (None, None)
+
+
+def test_oldest_delivery_is_evicted_at_capacity():
+    tracker = EtaTracker(max_entries=2)
+    for delivery_id in ("d-1", "d-2", "d-3"):
+        _, est = tracker.estimate(delivery_id, *A, 0.0, "IN_FLIGHT", 1000.0)
+        tracker.commit(delivery_id, est)
+
+    assert set(tracker._estimates) == {"d-2", "d-3"}
@@ -0,0 +1,53 @@
+from geofence import ENTER, EXIT, RESTRICTED, Fence, GeofenceEngine, GeofenceIndex
+
+SQUARE = [(43.30, 77.00), (43.30, 77.01), (43.31, 77.01), (43.31, 77.00)]
+
+
+def _engine() -> GeofenceEngine:
+    index = GeofenceIndex()
+    index.add(Fence.polygon("zone", RESTRICTED, SQUARE))
+    return GeofenceEngine(index)
+
+
+def test_polygon_and_circle_contains():
+    square = Fence.polygon("zone", RESTRICTED, SQUARE)
+    circle = Fence.circle("c", RESTRICTED, 43.30, 77.00, 100.0)
+
+    assert square.contains(43.305, 77.005)
+    assert not square.contains(43.315, 77.005)
+    assert circle.contains(43.3005, 77.0)
+    assert not circle.contains(43.302, 77.0)
+
+
+def test_evaluate_emits_enter_and_exit_once():
+    engine = _engine()
+
+    assert engine.evaluate("d-1", 43.295, 77.005) == []
+    [(kind, fence)] = engine.evaluate("d-1", 43.305, 77.005)
+    assert (kind, fence.id) == (ENTER, "zone")
+    assert engine.evaluate("d-1", 43.306, 77.005) == []
+    [(kind, fence)] = engine.evaluate("d-1", 43.315, 77.005)
+    assert (kind, fence.id) == (EXIT, "zone")
+
+
+def test_check_does_not_commit():
+    engine = _engine()
+
+    events, current = engine.check("d-1", 43.305, 77.005)
+    assert [kind for kind, _ in events] == [ENTER]
+    assert [kind for kind, _ in engine.check("d-1", 43.305, 77.005)[0]] == [ENTER]
+
+    engine.commit("d-1", current)
+    assert engine.check("d-1", 43.305, 77.005)[0] == []
+
+
+def test_delivery_fences_are_scoped():
+    engine = GeofenceEngine(GeofenceIndex(), pickup_radius_m=50.0, customer_radius_m=200.0)
+    engine.set_delivery_fences("d-1", (43.24, 76.90), (43.25, 76.92))
+
+    [(kind, fence)] = engine.evaluate("d-1", 43.24, 76.90)
+    assert (kind, fence.id) == (ENTER, "pickup:d-1")
+    assert engine.evaluate("d-2", 43.24, 76.90) == []
+
+    engine.forget("d-1")
+    assert not engine.has_delivery_fences("d-1")
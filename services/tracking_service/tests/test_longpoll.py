@@ -0,0 +1,71 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+CLAIMS = {"sub": "d-1"}
+
+
+def _get(main, after_version=None, timeout=5.0, if_none_match=None):
+    return asyncio.run(main.get_tracking("d-1", after_version, timeout, if_none_match, CLAIMS))
+
+
+def _ingest(main, payload) -> dict:
+    return asyncio.run(main.ingest_telemetry(payload, {}))
+
+
+def test_etag_follows_seq_and_honours_if_none_match(main, token, telemetry):
+    _ingest(main, telemetry("d-1", seq=1))
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {token('d-1')}"}
+
+    first = client.get("/track/d-1", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["ETag"] == '"1"'
+    assert first.json()["seq"] == 1
+
+    unchanged = client.get("/track/d-1", headers={**headers, "If-None-Match": '"1"'})
+    assert unchanged.status_code == 304
+
+    _ingest(main, telemetry("d-1", seq=2))
+    changed = client.get("/track/d-1", headers={**headers, "If-None-Match": '"1"'})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] == '"2"'
+
+
+def test_etag_changes_for_updates_without_seq(main, telemetry):
+    _ingest(main, telemetry("d-1", timestamp_utc=1000.0, progress=0.1))
+    first = _get(main)
+    _ingest(main, telemetry("d-1", timestamp_utc=1001.5, progress=0.2))
+    second = _get(main)
+
+    assert first.headers["ETag"] == '"1000000"'
+    assert second.headers["ETag"] == '"1001500"'
+    assert _get(main, if_none_match='"1000000"').status_code == 200
+    assert _get(main, if_none_match='"1001500"').status_code == 304
+    assert _get(main, after_version=1000000).status_code == 200
+
+
+def test_long_poll_returns_when_newer_state_arrives(main, telemetry):
+    _ingest(main, telemetry("d-1", seq=1))
+
+    async def _run():
+        poll = asyncio.create_task(main.get_tracking("d-1", 1, 5.0, None, CLAIMS))
+        await asyncio.sleep(0.05)
+        assert not poll.done()
+        await main.ingest_telemetry(telemetry("d-1", seq=2, progress=0.6), {})
+        return await asyncio.wait_for(poll, 1.0)
+
+    resp = asyncio.run(_run())
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == '"2"'
+    assert not main._state_waiters
+
+
+def test_long_poll_times_out_with_not_modified(main, telemetry):
+    _ingest(main, telemetry("d-1", seq=3))
+
+    resp = _get(main, after_version=3, timeout=0.05)
+
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == '"3"'
@@ -0,0 +1,78 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import Registry, RequestMetricsMiddleware
+
+
+def test_counter_sums_shards_across_threads():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs", ("result",))
+
+    def _work():
+        for _ in range(100):
+            counter.inc("ok")
+
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("failed", amount=2.5)
+
+    assert counter.render() == ['jobs_total{result="failed"} 2.5', 'jobs_total{result="ok"} 400']
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "read")
+
+    assert histogram.render() == [
+        'op_seconds_bucket{op="read",le="0.1"} 1',
+        'op_seconds_bucket{op="read",le="1"} 3',
+        'op_seconds_bucket{op="read",le="+Inf"} 4',
+        'op_seconds_sum{op="read"} 4.05',
+        'op_seconds_count{op="read"} 4',
+    ]
+
+
+def test_registry_renders_help_type_and_escaped_labels():
+    registry = Registry()
+    registry.counter("errors_total", "Errors", ("loop",)).inc('a"b\\c')
+    registry.gauge("queue_depth", "Queued items", lambda: 7)
+
+    assert registry.render() == "\n".join(
+        [
+            "# HELP errors_total Errors",
+            "# TYPE errors_total counter",
+            'errors_total{loop="a\\"b\\\\c"} 1',
+            "# HELP queue_depth Queued items",
+            "# TYPE queue_depth gauge",
+            "queue_depth 7",
+        ]
+    ) + "\n"
+
+
+def test_middleware_labels_requests_by_route_template():
+    registry = Registry()
+    histogram = registry.histogram("http_seconds", "HTTP latency", ("method", "route", "status"))
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware, histogram=histogram)
+
+    @app.get("/items/{item_id}")
+    def _item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    counts = [line for line in histogram.render() if line.startswith("http_seconds_count")]
+    assert counts == [
+        'http_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2',
+        'http_seconds_count{method="GET",route="unmatched",status="404"} 1',
+    ]
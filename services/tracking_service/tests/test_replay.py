@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from replay import ReplayBuffer
+
+
+def _seqs(events) -> list[int]:
+    return [seq for seq, _ in events]
+
+
+def test_since_returns_events_after_seq():
+    buffer = ReplayBuffer(events_per_delivery=4)
+    for seq in range(1, 5):
+        buffer.append("d-1", seq, f"m{seq}")
+
+    assert _seqs(buffer.since("d-1", 0)) == [1, 2, 3, 4]
+    assert _seqs(buffer.since("d-1", 2)) == [3, 4]
+    assert buffer.since("d-1", 4) == []
+    assert buffer.latest("d-1") == (4, "m4")
+
+
+def test_since_reports_gaps_and_unknown_deliveries():
+    buffer = ReplayBuffer(events_per_delivery=3)
+    for seq in range(1, 7):
+        buffer.append("d-1", seq, f"m{seq}")
+
+    assert buffer.since("unknown", 0) is None
+    assert buffer.since("d-1", 2) is None
+    assert _seqs(buffer.since("d-1", 3)) == [4, 5, 6]
+
+
+def test_least_recently_updated_delivery_is_evicted():
+    buffer = ReplayBuffer(events_per_delivery=2, max_deliveries=2)
+    buffer.append("d-1", 1, "a")
+    buffer.append("d-2", 1, "b")
+    buffer.append("d-1", 2, "c")
+    buffer.append("d-3", 1, "d")
+
+    assert buffer.latest("d-2") is None
+    assert buffer.latest("d-1") == (2, "c")
+    assert buffer.latest("d-3") == (1, "d")
+
+
+def _replays(main, source: str) -> float:
+    prefix = f'ws_replay_requests_total{{source="{source}"}} '
+    return next((float(line[len(prefix):]) for line in main.replay_requests.render() if line.startswith(prefix)), 0.0)
+
+
+def _collector(main, on_message=None):
+    class _Collector(main._Subscriber):
+        def __init__(self) -> None:
+            super().__init__("d-1")
+            self.seqs: list[int] = []
+
+        async def send_text(self, message: str) -> None:
+            seq = json.loads(message)["seq"]
+            self.seqs.append(seq)
+            if on_message is not None:
+                await on_message(seq)
+
+    return _Collector()
+
+
+def test_catch_up_switches_from_db_to_memory_to_live(main, telemetry, monkeypatch):
+    monkeypatch.setattr(main, "replay_buffer", ReplayBuffer(events_per_delivery=3))
+    monkeypatch.setattr(main, "REPLAY_DB_MAX_EVENTS", 5)
+    db_replays = _replays(main, "db")
+
+    async def _arrives_during_catch_up(seq: int) -> None:
+        if seq == 5:
+            await main.ingest_telemetry(telemetry("d-1", seq=11), {})
+
+    subscriber = _collector(main, _arrives_during_catch_up)
+
+    async def _run():
+        for seq in range(1, 11):
+            await main.ingest_telemetry(telemetry("d-1", seq=seq), {})
+        await main._attach("d-1", subscriber, 2)
+        assert subscriber in main.connected_clients["d-1"]
+        await main.ingest_telemetry(telemetry("d-1", seq=12), {})
+        await main._detach("d-1", subscriber)
+
+    asyncio.run(_run())
+
+    assert subscriber.seqs == list(range(3, 13))
+    assert "d-1" not in main.connected_clients
+    assert _replays(main, "db") == db_replays + 1
+
+
+def test_catch_up_without_last_seq_sends_latest_state_then_live(main, telemetry):
+    subscriber = _collector(main)
+
+    async def _run():
+        await main.ingest_telemetry(telemetry("d-1", seq=1), {})
+        await main.ingest_telemetry(telemetry("d-1", seq=2), {})
+        await main._attach("d-1", subscriber, None)
+        await main.ingest_telemetry(telemetry("d-1", seq=3), {})
+
+    asyncio.run(_run())
+
+    assert subscriber.seqs == [2, 3]
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+
+
+def _insert(main, table: str, timestamps: list[float]) -> None:
+    with main.get_conn() as conn:
+        if table == "status_transitions":
+            conn.executemany(
+                "INSERT INTO status_transitions (delivery_id, status, seq, timestamp_utc) VALUES ('d-1', 'IN_FLIGHT', NULL, ?)",
+                [(ts,) for ts in timestamps],
+            )
+        else:
+            conn.executemany(
+                """
+                INSERT INTO geofence_events (delivery_id, fence_id, kind, event, lat, lng, seq, timestamp_utc)
+                VALUES ('d-1', 'f-1', 'pickup', 'enter', 43.24, 76.90, NULL, ?)
+                """,
+                [(ts,) for ts in timestamps],
+            )
+        conn.commit()
+
+
+def _timestamps(main, table: str) -> list[float]:
+    with main.get_conn() as conn:
+        return [r["timestamp_utc"] for r in conn.execute(f"SELECT timestamp_utc FROM {table} ORDER BY id")]
+
+
+def test_purge_deletes_expired_rows_in_batches(main, monkeypatch):
+    now = time.time()
+    old = [now - 7200 - i for i in range(5)]
+    monkeypatch.setattr(main, "RETENTION_PURGE_BATCH_SIZE", 2)
+    for table in ("status_transitions", "geofence_events"):
+        _insert(main, table, old + [now - 60, now])
+
+        assert asyncio.run(main._purge_expired(table, 3600)) == 5
+        assert _timestamps(main, table) == [now - 60, now]
+
+
+def test_purge_keeps_status_feed_ids(main):
+    now = time.time()
+    _insert(main, "status_transitions", [now - 7200, now])
+    [_, kept] = main._get_status_transitions(0, 10)
+
+    asyncio.run(main._purge_expired("status_transitions", 3600))
+
+    assert [t.id for t in main._get_status_transitions(0, 10)] == [kept.id]
+    _insert(main, "status_transitions", [now])
+    assert main._get_status_transitions(kept.id, 10)[0].id > kept.id
+
+
+def test_background_failure_logs_first_error_and_backs_off(main, caplog):
+    with caplog.at_level(logging.WARNING, logger="tracking_service"):
+        first = main._background_failure("retention", 1, RuntimeError("locked"), 1.0)
+        later = main._background_failure("retention", 10, RuntimeError("locked"), 1.0)
+
+    assert first == 2.0
+    assert later == main.BACKGROUND_BACKOFF_MAX_SECONDS
+    assert [r.getMessage() for r in caplog.records] == ["Background loop retention error: locked"]
@@ -0,0 +1,60 @@
+from sequencing import DUPLICATE, IN_ORDER, REORDERED, SequenceTracker
+
+
+def test_classify_does_not_record():
+    tracker = SequenceTracker()
+
+    assert tracker.classify("d-1", 5) == IN_ORDER
+    assert tracker.classify("d-1", 5) == IN_ORDER
+
+    tracker.record("d-1", 5)
+    assert tracker.classify("d-1", 5) == DUPLICATE
+
+
+def test_classify_in_order_duplicate_and_reordered():
+    tracker = SequenceTracker()
+    for seq in (1, 2, 4):
+        assert tracker.classify("d-1", seq) == IN_ORDER
+        tracker.record("d-1", seq)
+
+    assert tracker.classify("d-1", 2) == DUPLICATE
+    assert tracker.classify("d-1", 3) == REORDERED
+    tracker.record("d-1", 3)
+    assert tracker.classify("d-1", 3) == DUPLICATE
+    assert tracker.classify("d-1", 5) == IN_ORDER
+
+
+def test_classify_outside_window_is_reordered():
+    tracker = SequenceTracker(window=8)
+    tracker.record("d-1", 1)
+    tracker.record("d-1", 20)
+
+    assert tracker.classify("d-1", 1) == REORDERED
+    assert tracker.classify("d-1", 12) == REORDERED
+    assert tracker.classify("d-1", 13) == REORDERED
+    tracker.record("d-1", 13)
+    assert tracker.classify("d-1", 13) == DUPLICATE
+
+
+def test_window_slides_with_high_mark():
+    tracker = SequenceTracker(window=8)
+    tracker.record("d-1", 10)
+    tracker.record("d-1", 14)
+
+    assert tracker.classify("d-1", 10) == DUPLICATE
+    tracker.record("d-1", 17)
+    assert tracker.classify("d-1", 10) == DUPLICATE
+    tracker.record("d-1", 18)
+    assert tracker.classify("d-1", 10) == REORDERED
+    assert tracker.classify("d-1", 14) == DUPLICATE
+
+
+def test_deliveries_are_tracked_independently():
+    tracker = SequenceTracker(max_entries=2)
+    tracker.record("d-1", 3)
+    tracker.record("d-2", 3)
+
+    assert tracker.classify("d-2", 3) == DUPLICATE
+    tracker.record("d-3", 1)
+    assert tracker.classify("d-1", 3) == IN_ORDER
+    assert tracker.classify("d-3", 1) == DUPLICATE
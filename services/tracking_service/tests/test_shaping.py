@@ -0,0 +1,60 @@
+from shaping import RateShaper, TimerWheel
+
+
+def test_advance_fires_items_once_due():
+    wheel = TimerWheel(tick_seconds=0.1, slots=16)
+    wheel.advance(10.0)
+    wheel.schedule("a", 10.25)
+    wheel.schedule("b", 10.5)
+
+    assert wheel.advance(10.2) == []
+    assert wheel.advance(10.3) == ["a"]
+    assert wheel.advance(10.3) == []
+    assert wheel.advance(11.0) == ["b"]
+
+
+def test_schedule_in_past_fires_on_next_tick():
+    wheel = TimerWheel(tick_seconds=0.1, slots=16)
+    wheel.advance(10.0)
+    wheel.schedule("late", 9.0)
+
+    assert wheel.advance(10.15) == ["late"]
+
+
+def test_advance_keeps_items_beyond_one_rotation():
+    wheel = TimerWheel(tick_seconds=0.1, slots=16)
+    wheel.advance(10.0)
+    wheel.schedule("far", 12.0)
+
+    assert wheel.advance(10.5) == []
+    assert wheel.advance(11.95) == []
+    assert wheel.advance(12.0) == ["far"]
+
+
+def test_advance_after_long_gap_fires_everything_due():
+    wheel = TimerWheel(tick_seconds=0.1, slots=16)
+    wheel.advance(10.0)
+    for n in range(10):
+        wheel.schedule(n, 10.0 + n * 0.3)
+
+    assert sorted(wheel.advance(100.0)) == list(range(10))
+
+
+def test_rate_shaper_coalesces_until_interval_passes():
+    shaper = RateShaper(max_hz=2.0)
+
+    assert shaper.offer("m1", "IN_FLIGHT", 0.0)
+    shaper.sent("IN_FLIGHT", 0.0)
+    assert not shaper.offer("m2", "IN_FLIGHT", 0.2)
+    assert not shaper.offer("m3", "IN_FLIGHT", 0.3)
+    assert shaper.pending == ("m3", "IN_FLIGHT")
+    assert shaper.due_at() == 0.5
+    assert shaper.offer("m4", "IN_FLIGHT", 0.5)
+    assert shaper.pending is None
+
+
+def test_rate_shaper_passes_status_changes():
+    shaper = RateShaper(max_hz=2.0)
+    shaper.sent("IN_FLIGHT", 0.0)
+
+    assert shaper.offer("m", "DELIVERED", 0.1)
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from tracing import TraceStore, new_trace_id
+
+
+def test_store_caps_spans_and_deliveries():
+    store = TraceStore(max_deliveries=2, max_spans_per_delivery=2)
+    for i in range(3):
+        store.record("d-1", "t-1", "telemetry", seq=i)
+    store.record("d-2", "t-2", "telemetry")
+    store.record("d-3", "t-3", "telemetry")
+
+    assert store.get("d-1") == []
+    assert [s["trace_id"] for s in store.get("d-2")] == ["t-2"]
+    assert [s["trace_id"] for s in store.get("d-3")] == ["t-3"]
+
+
+def test_store_keeps_latest_spans_and_appends_to_log(tmp_path):
+    log_path = tmp_path / "traces.jsonl"
+    store = TraceStore(max_spans_per_delivery=2, log_path=str(log_path))
+    for i in range(3):
+        store.record("d-1", "t-1", "telemetry", seq=i)
+
+    assert [s["seq"] for s in store.get("d-1")] == [1, 2]
+    lines = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert [line["seq"] for line in lines] == [0, 1, 2]
+    assert lines[0] == {"delivery_id": "d-1", "trace_id": "t-1", "name": "telemetry", "seq": 0}
+
+
+def test_trace_ids_are_unique_hex():
+    first, second = new_trace_id(), new_trace_id()
+
+    assert first != second
+    assert len(first) == 32 and int(first, 16) >= 0
+
+
+def test_telemetry_hops_are_reported_per_point(main, telemetry, token):
+    trace_id = new_trace_id()
+    asyncio.run(main.ingest_telemetry(telemetry("d-trace", seq=1, trace_id=trace_id, emitted_at=1000.0, timestamp_utc=1000.0), {}))
+    asyncio.run(main.ingest_telemetry(telemetry("d-trace", seq=2, trace_id=trace_id), {}))
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {token('ops', role='operator', scopes=())}"}
+
+    resp = client.get("/traces/d-trace", headers=headers)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["trace_id"] == trace_id
+    first, second = body["points"][-2:]
+    assert first["transport_ms"] > 0
+    assert second["transport_ms"] is None
+    assert first["subscribers"] == 0
+    assert first["total_ms"] >= first["persist_ms"] + first["broadcast_ms"]
+    assert client.get("/traces/unknown", headers=headers).status_code == 404